@@ -0,0 +1,149 @@
+"""
+EXIF读取基准测试：比较 Pillow 打开图片读取EXIF与直接扫描文件头两种方式的延迟和读取字节数
+
+用法:
+    python benchmarks/bench_exif_read.py [--corpus 目录] [--files 50 --width 4000 --height 3000 --rounds 5]
+
+不指定 --corpus 时生成一组带EXIF的测试JPEG
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piexif
+from PIL import Image
+
+from exif_utils import parse_exif_dict, read_exif_bytes
+
+EXTENSIONS = ('.jpg', '.jpeg', '.tif', '.tiff')
+
+
+class CountingFileIO(io.FileIO):
+    """统计实际从操作系统读取的字节数"""
+
+    def __init__(self, path):
+        super().__init__(path, 'rb')
+        self.bytes_read = 0
+
+    def readinto(self, b):
+        n = super().readinto(b)
+        self.bytes_read += n or 0
+        return n
+
+
+def make_corpus(work_dir, count, width, height):
+    """生成带EXIF和噪点的测试JPEG，噪点让压缩后的大小接近真实照片"""
+    noise = Image.effect_noise((width, height), 64).convert('RGB')
+    paths = []
+    for i in range(count):
+        exif_bytes = piexif.dump({
+            '0th': {piexif.ImageIFD.Make: b'Bench', piexif.ImageIFD.Model: f'Camera {i}'.encode()},
+            'Exif': {
+                piexif.ExifIFD.DateTimeOriginal: b'2024:01:01 12:00:00',
+                piexif.ExifIFD.UserComment: b'ASCII\0\0\0' + f'photo {i}'.encode(),
+            },
+            'GPS': {piexif.GPSIFD.GPSLatitudeRef: b'N', piexif.GPSIFD.GPSLatitude: ((31, 1), (14, 1), (0, 1))},
+        })
+        path = os.path.join(work_dir, f'{i:04d}.jpg')
+        noise.save(path, 'JPEG', quality=92, exif=exif_bytes)
+        paths.append(path)
+    return paths
+
+
+def pillow_read(path):
+    """旧方式：通过 Pillow 打开图片读取 info['exif']"""
+    raw = CountingFileIO(path)
+    with io.BufferedReader(raw) as f:
+        img = Image.open(f)
+        exif_data = img.info.get('exif', b'') if img.format in ('JPEG', 'TIFF') else b''
+        result = parse_exif_dict(piexif.load(exif_data)) if exif_data else ({}, {})
+    return result, raw.bytes_read
+
+
+def header_read(path):
+    """新方式：直接扫描 JPEG 标记 / TIFF 头"""
+    raw = CountingFileIO(path)
+    with io.BufferedReader(raw) as f:
+        exif_data = read_exif_bytes(f)
+        result = parse_exif_dict(piexif.load(exif_data)) if exif_data else ({}, {})
+        if hasattr(exif_data, 'close'):
+            exif_data.close()
+    return result, raw.bytes_read
+
+
+def bench(func, paths, rounds):
+    timings = []
+    bytes_read = 0
+    for _ in range(rounds):
+        for path in paths:
+            start = time.perf_counter()
+            _, n = func(path)
+            timings.append(time.perf_counter() - start)
+            bytes_read += n
+    timings.sort()
+    return {
+        'median_us': timings[len(timings) // 2] * 1e6,
+        'p95_us': timings[int(len(timings) * 0.95)] * 1e6,
+        'bytes_per_file': bytes_read / (rounds * len(paths)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='包含 JPEG/TIFF 文件的目录')
+    parser.add_argument('--files', type=int, default=50)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    work_dir = None
+    try:
+        if args.corpus:
+            paths = sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(args.corpus)
+                for name in names if name.lower().endswith(EXTENSIONS)
+            )
+        else:
+            work_dir = tempfile.mkdtemp()
+            paths = make_corpus(work_dir, args.files, args.width, args.height)
+        if not paths:
+            print("没有找到测试文件")
+            return
+
+        total_size = sum(os.path.getsize(p) for p in paths)
+        print(f"测试文件: {len(paths)} 个, 平均 {total_size / len(paths) / 1024:.0f} KB")
+
+        # JPEG 的结果必须与 Pillow 一致（Pillow 不提供 TIFF 的 info['exif']）
+        mismatched = [
+            p for p in paths
+            if not p.lower().endswith(('.tif', '.tiff')) and pillow_read(p)[0] != header_read(p)[0]
+        ]
+        print(f"结果不一致的文件: {len(mismatched)}")
+        for p in mismatched[:10]:
+            print(f"  {p}")
+
+        results = {
+            'pillow': bench(pillow_read, paths, args.rounds),
+            'header_scan': bench(header_read, paths, args.rounds),
+        }
+        for name, r in results.items():
+            print(f"{name:12s} median {r['median_us']:9.1f} us  p95 {r['p95_us']:9.1f} us  "
+                  f"读取 {r['bytes_per_file'] / 1024:8.1f} KB/文件")
+
+        speedup = results['pillow']['median_us'] / results['header_scan']['median_us']
+        print(f"加速比: {speedup:.1f}x")
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
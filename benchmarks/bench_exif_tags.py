@@ -0,0 +1,153 @@
+"""
+EXIF标签查找基准测试：比较逐个遍历标签表与预先构建的标签注册表在解析和写入时的耗时
+
+解析: 标签ID → 标签名（get_exif_data / parse_exif_dict）
+写入: 标签名 → 标签ID（modify_exif_info）
+
+用法:
+    python benchmarks/bench_exif_tags.py [--custom-tags 300 --rounds 200]
+
+测试数据包含 0th/Exif/GPS 中所有可写入的标准标签，以及指定数量的自定义标签
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piexif
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+from exif_utils import (
+    CUSTOM_TAG_ID_START, CUSTOM_TAG_NAMES_TAG, _decode_exif_value, get_exif_data, lookup_tag_id,
+    modify_exif_info, parse_exif_dict
+)
+
+# 各类型的示例值
+SAMPLE_VALUES = {
+    piexif.TYPES.Byte: 1,
+    piexif.TYPES.Ascii: b'bench',
+    piexif.TYPES.Short: 1,
+    piexif.TYPES.Long: 1,
+    piexif.TYPES.Rational: (1, 1),
+    piexif.TYPES.Undefined: b'bench',
+    piexif.TYPES.SLong: 1,
+    piexif.TYPES.SRational: (1, 1),
+}
+
+# IFD 指针由 piexif 自动生成
+POINTER_TAGS = {
+    piexif.ImageIFD.ExifTag, piexif.ImageIFD.GPSTag,
+    piexif.ExifIFD.InteroperabilityTag, piexif.ImageIFD.JPEGInterchangeFormat,
+    piexif.ImageIFD.JPEGInterchangeFormatLength,
+}
+
+
+def make_exif_dict(custom_tags):
+    """
+    生成包含所有标准标签和自定义标签的EXIF字典，与 piexif.load 的结果格式相同。
+    piexif.dump 不支持未知标签，自定义标签在读回后再加入
+    """
+    exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}, 'Interop': {}, '1st': {}, 'thumbnail': None}
+    for ifd in ('0th', 'Exif', 'GPS'):
+        for tag_id, info in piexif.TAGS[ifd].items():
+            if tag_id not in POINTER_TAGS and info['type'] in SAMPLE_VALUES:
+                exif_dict[ifd][tag_id] = SAMPLE_VALUES[info['type']]
+    exif_dict = piexif.load(piexif.dump(exif_dict))
+
+    custom_names = {}
+    for i in range(custom_tags):
+        tag_id = CUSTOM_TAG_ID_START + i
+        exif_dict['0th'][tag_id] = f'value {i}'.encode()
+        custom_names[str(tag_id)] = f'Custom{i}'
+    exif_dict['0th'][CUSTOM_TAG_NAMES_TAG] = json.dumps(custom_names).encode()
+    return exif_dict
+
+
+def legacy_parse(exif_dict):
+    """旧方式：每个标签分别在 piexif.TAGS 中查找，不识别自定义标签（省略了 UserComment 的特殊处理）"""
+    parsed = {}
+    tag_ids = {}
+    for ifd in ('0th', 'Exif', 'GPS'):
+        for tag_id, value in exif_dict.get(ifd, {}).items():
+            if tag_id in piexif.TAGS[ifd]:
+                tag_name = piexif.TAGS[ifd][tag_id]['name']
+                parsed[tag_name] = _decode_exif_value(value)
+                tag_ids[tag_name] = f"{ifd}.{hex(tag_id)}"
+    return parsed, tag_ids
+
+
+def legacy_lookup(tag_name):
+    """旧方式：遍历 Pillow 的 TAGS 查找标签名"""
+    for k, v in TAGS.items():
+        if v == tag_name:
+            return k
+    return None
+
+
+def bench(func, rounds):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--custom-tags', type=int, default=300)
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args()
+
+    standard_dict = make_exif_dict(0)
+    del standard_dict['0th'][CUSTOM_TAG_NAMES_TAG]
+    exif_dict = make_exif_dict(args.custom_tags)
+    standard_count = sum(len(standard_dict[ifd]) for ifd in ('0th', 'Exif', 'GPS'))
+    print(f"标准标签: {standard_count} 个, 自定义标签: {args.custom_tags} 个")
+
+    # 写入时按名称查找：标准标签名 + 自定义标签名
+    names = [name for name in TAGS.values()][:standard_count]
+    names += [f'Custom{i}' for i in range(args.custom_tags)]
+    custom_tag_ids = {f'Custom{i}': CUSTOM_TAG_ID_START + i for i in range(args.custom_tags)}
+
+    # 旧的解析方式不识别自定义标签，只用标准标签比较
+    results = {
+        '解析 (旧)': bench(lambda: legacy_parse(standard_dict), args.rounds),
+        '解析 (注册表)': bench(lambda: parse_exif_dict(standard_dict), args.rounds),
+        '解析含自定义标签': bench(lambda: parse_exif_dict(exif_dict), args.rounds),
+        '写入查找 (旧)': bench(lambda: [legacy_lookup(name) for name in names], args.rounds),
+        '写入查找 (注册表)': bench(lambda: [lookup_tag_id(name, custom_tag_ids) for name in names], args.rounds),
+    }
+    for name, median_us in results.items():
+        print(f"{name:14s} median {median_us:10.1f} us")
+    print(f"解析加速比: {results['解析 (旧)'] / results['解析 (注册表)']:.1f}x")
+    print(f"写入查找加速比: {results['写入查找 (旧)'] / results['写入查找 (注册表)']:.1f}x")
+
+    # 完整流程：在真实文件上写入数百个自定义标签后读回
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, 'bench.jpg')
+        Image.new('RGB', (64, 64)).save(path, 'JPEG')
+        custom_data = {f'Custom{i}': f'value {i}' for i in range(args.custom_tags)}
+        start = time.perf_counter()
+        modify_exif_info(path, custom_data=custom_data)
+        encode_ms = (time.perf_counter() - start) * 1e3
+        start = time.perf_counter()
+        exif_data, _ = get_exif_data(path)
+        decode_ms = (time.perf_counter() - start) * 1e3
+        restored = sum(1 for name, value in custom_data.items() if exif_data.get(name) == value)
+        print(f"modify_exif_info 写入 {args.custom_tags} 个标签: {encode_ms:.1f} ms, "
+              f"get_exif_data 读回: {decode_ms:.1f} ms, 读回一致: {restored}/{args.custom_tags}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+EXIF 工具函数微基准：get_exif_data（读取并解析）和 modify_exif_info（添加、删除标签后写回文件），
+使用 corpus.py 生成的带完整 EXIF 的照片，结果保存为 JSON
+
+用法:
+    python benchmarks/bench_exif_utils.py [--files 20 --width 1600 --height 1200 --rounds 5 --output 结果.json]
+
+不指定 --output 时保存到 benchmarks/results/exif_utils-<提交>.json
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus import make_corpus
+from exif_utils import get_exif_data, modify_exif_info
+from results import print_results, save_results, summarize
+
+
+def bench(func, paths, rounds, warmup=1, setup=None):
+    """对每个文件执行 func，预热后计时 rounds 轮。setup 在每次执行前调用，不计时"""
+    for _ in range(warmup):
+        for path in paths:
+            if setup:
+                setup(path)
+            func(path)
+    durations = []
+    for _ in range(rounds):
+        for path in paths:
+            if setup:
+                setup(path)
+            start = time.perf_counter()
+            func(path)
+            durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='结果文件路径')
+    args = parser.parse_args()
+
+    # modify_exif_info 每次修改都会记录日志
+    logging.getLogger('exif_utils').setLevel(logging.ERROR)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        paths = make_corpus(work_dir, args.files, args.width, args.height, args.seed)
+        total_size = sum(os.path.getsize(p) for p in paths)
+        print(f"测试文件: {len(paths)} 个, 平均 {total_size / len(paths) / 1024:.0f} KB")
+
+        # 每轮修改同一组标签，文件大小保持稳定
+        counter = iter(range(10 ** 9))
+        results = {
+            'get_exif_data': bench(get_exif_data, paths, args.rounds),
+            'modify_exif_add': bench(
+                lambda p: modify_exif_info(p, {'Artist': f'bench {next(counter)}', 'BenchNote': 'value'}),
+                paths, args.rounds),
+            # 删除前先写入要删除的 Artist 标签
+            'modify_exif_delete': bench(
+                lambda p: modify_exif_info(p, tags_to_delete=[0x013b]),
+                paths, args.rounds, setup=lambda p: modify_exif_info(p, {'Artist': 'bench'})),
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+    print_results(results)
+    print(f"结果已保存: {save_results('exif_utils', vars(args), results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
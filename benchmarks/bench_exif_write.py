@@ -0,0 +1,104 @@
+"""
+EXIF写入基准测试：比较 Pillow 重新编码与直接替换 APP1 段两种方式
+
+用法:
+    python benchmarks/bench_exif_write.py [--width 4000 --height 3000 --rounds 10]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piexif
+from PIL import Image
+
+from exif_utils import write_exif
+
+
+def make_sample_jpeg(path, width, height):
+    """生成一张带EXIF和噪点的测试JPEG，噪点让压缩后的大小接近真实照片"""
+    img = Image.effect_noise((width, height), 64).convert('RGB')
+    exif_bytes = piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'Bench', piexif.ImageIFD.Model: b'Camera'},
+        'Exif': {piexif.ExifIFD.DateTimeOriginal: b'2024:01:01 12:00:00'},
+        'GPS': {},
+    })
+    img.save(path, 'JPEG', quality=92, exif=exif_bytes)
+
+
+def make_exif_bytes(i):
+    return piexif.dump({
+        '0th': {piexif.ImageIFD.Make: b'Bench', piexif.ImageIFD.Model: b'Camera'},
+        'Exif': {piexif.ExifIFD.UserComment: b'ASCII\0\0\0' + f'edit {i}'.encode()},
+        'GPS': {},
+    })
+
+
+def pillow_write(path, exif_bytes):
+    """旧方式：解码并重新编码整张图片"""
+    img = Image.open(path)
+    img.save(path, exif=exif_bytes)
+
+
+def image_data(path):
+    """返回 SOS 之后的压缩图像数据，用于确认像素数据没有改变"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data[data.index(b'\xff\xda'):]
+
+
+def bench(func, path, rounds):
+    timings = []
+    for i in range(rounds):
+        exif_bytes = make_exif_bytes(i)
+        start = time.perf_counter()
+        func(path, exif_bytes)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        'median_ms': timings[len(timings) // 2] * 1000,
+        'min_ms': timings[0] * 1000,
+        'max_ms': timings[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        sample = os.path.join(work_dir, 'sample.jpg')
+        make_sample_jpeg(sample, args.width, args.height)
+        print(f"测试图片: {args.width}x{args.height}, {os.path.getsize(sample)} 字节")
+
+        old_path = os.path.join(work_dir, 'old.jpg')
+        new_path = os.path.join(work_dir, 'new.jpg')
+        shutil.copy(sample, old_path)
+        shutil.copy(sample, new_path)
+
+        results = {
+            'pillow_reencode': bench(pillow_write, old_path, args.rounds),
+            'app1_splice': bench(write_exif, new_path, args.rounds),
+        }
+        for name, r in results.items():
+            print(f"{name:16s} median {r['median_ms']:8.2f} ms  "
+                  f"min {r['min_ms']:8.2f} ms  max {r['max_ms']:8.2f} ms")
+
+        speedup = results['pillow_reencode']['median_ms'] / results['app1_splice']['median_ms']
+        print(f"加速比: {speedup:.1f}x")
+        print(f"图像数据未改变: {image_data(sample) == image_data(new_path)}")
+        print(f"重新编码后图像数据未改变: {image_data(sample) == image_data(old_path)}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+索引基准测试：在 SQLite 中生成大量图片记录，比较加索引前后热点查询的延迟
+
+用法:
+    python benchmarks/bench_indexes.py [--images 1000000 --folders 10000 --users 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from models import db
+
+# 与各个路由中的查询对应
+QUERIES = {
+    'check_file_exists': (
+        "SELECT id FROM image WHERE file_hash = :file_hash AND folder_id = :folder_id LIMIT 1"
+    ),
+    'view_folder': (
+        "SELECT id, filename FROM image WHERE folder_id = :folder_id "
+        "ORDER BY upload_date DESC, id DESC LIMIT 100"
+    ),
+    'index': "SELECT id, name FROM folder WHERE user_id = :user_id",
+    'image_by_filename': "SELECT id, folder_id FROM image WHERE filename = :filename",
+}
+
+
+def seed(engine, users, folders, images):
+    """建表（不含索引）并写入测试数据"""
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            table.create(conn)
+            for index in table.indexes:
+                index.drop(conn)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.executemany(
+            "INSERT INTO user (id, username, password_hash) VALUES (?, ?, '')",
+            ((i, f"user{i}") for i in range(1, users + 1))
+        )
+        cur.executemany(
+            "INSERT INTO folder (id, name, user_id, created_at) VALUES (?, ?, ?, ?)",
+            ((i, f"folder{i}", (i % users) + 1, datetime(2024, 1, 1)) for i in range(1, folders + 1))
+        )
+        start = datetime(2024, 1, 1)
+        batch = []
+        for i in range(1, images + 1):
+            folder_id = random.randint(1, folders)
+            batch.append((
+                i, f"{i:032x}.jpg", f"IMG_{i}.jpg", folder_id, (folder_id % users) + 1,
+                f"{random.getrandbits(256):064x}", start + timedelta(seconds=i)
+            ))
+            if len(batch) == 50000:
+                _insert_images(cur, batch)
+                batch = []
+        _insert_images(cur, batch)
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def _insert_images(cur, rows):
+    cur.executemany(
+        "INSERT INTO image (id, filename, original_filename, folder_id, user_id, file_hash, upload_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+def sample_params(conn, count):
+    """取一批真实存在的查询参数"""
+    rows = conn.execute(text(
+        "SELECT file_hash, folder_id, user_id, filename FROM image ORDER BY random() LIMIT :n"
+    ), {'n': count}).fetchall()
+    return [
+        {'file_hash': r[0], 'folder_id': r[1], 'user_id': r[2], 'filename': r[3]}
+        for r in rows
+    ]
+
+
+def run_queries(conn, params):
+    results = {}
+    for name, sql in QUERIES.items():
+        stmt = text(sql)
+        timings = []
+        for p in params:
+            start = time.perf_counter()
+            conn.execute(stmt, p).fetchall()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        plan = conn.execute(text('EXPLAIN QUERY PLAN ' + sql), params[0]).fetchall()
+        results[name] = {
+            'median_ms': timings[len(timings) // 2] * 1000,
+            'p99_ms': timings[int(len(timings) * 0.99)] * 1000,
+            'plan': ' | '.join(row[-1] for row in plan),
+        }
+    return results
+
+
+def print_results(title, results):
+    print(title)
+    for name, r in results.items():
+        print(f"  {name:18s} median {r['median_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms  {r['plan']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=1000000)
+    parser.add_argument('--folders', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    db_path = os.path.join(work_dir, 'bench.db')
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        start = time.perf_counter()
+        seed(engine, args.users, args.folders, args.images)
+        print(f"写入 {args.images} 条图片记录用时 {time.perf_counter() - start:.1f} s")
+
+        with engine.connect() as conn:
+            params = sample_params(conn, args.samples)
+            print_results('无索引:', run_queries(conn, params))
+
+        with engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(conn)
+            conn.execute(text('ANALYZE'))
+
+        with engine.connect() as conn:
+            print_results('有索引:', run_queries(conn, params))
+    finally:
+        engine.dispose()
+        os.remove(db_path)
+        os.rmdir(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+SQLite 并发基准测试：多个进程（模拟 gunicorn 工作进程）同时调用 /upload，
+另有进程同时浏览文件夹图片列表，统计 database is locked 错误率、延迟和吞吐量，
+比较原来的默认设置（回滚日志）与 SQLITE_PRAGMAS 调优后的结果
+
+用法:
+    python benchmarks/bench_sqlite_concurrency.py [--workers 8 --uploads 50 --readers 2]
+
+每种设置使用单独的临时目录和数据库
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# default: 修改前的行为，回滚日志 + pysqlite 默认的 5 秒锁等待
+PROFILES = {
+    'default': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'tuned': None,  # 使用 database.DEFAULT_SQLITE_PRAGMAS
+}
+
+
+def load_app(work_dir, profile):
+    """在子进程中按指定设置加载应用，必须在导入 app 之前修改 PRAGMA"""
+    os.chdir(work_dir)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'app.db')}"
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    # 屏蔽应用的调试输出，只保留结果
+    sys.stdout = open(os.devnull, 'w')
+    import database
+    if PROFILES[profile] is not None:
+        database.DEFAULT_SQLITE_PRAGMAS.clear()
+        database.DEFAULT_SQLITE_PRAGMAS.update(PROFILES[profile])
+    from app import app
+    app.config['TESTING'] = True
+    return app
+
+
+def setup(work_dir, profile, workers, result_queue):
+    """创建用户和每个工作进程使用的文件夹"""
+    app = load_app(work_dir, profile)
+    from models import db, Folder, User
+    with app.app_context():
+        user = User(username='bench')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.flush()
+        folders = [Folder(name=f'bench-{i}', user_id=user.id) for i in range(workers)]
+        db.session.add_all(folders)
+        db.session.commit()
+        journal_mode = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+        result_queue.put(([folder.id for folder in folders], journal_mode))
+
+
+def login(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    return client
+
+
+def upload_worker(work_dir, profile, folder_id, uploads, barrier, result_queue):
+    import io
+    app = load_app(work_dir, profile)
+    client = login(app)
+    barrier.wait()
+
+    results = []
+    for _ in range(uploads):
+        # 内容各不相同，每次都会写入新的 Image、Blob 和任务记录
+        payload = b'\xff\xd8' + os.urandom(4096)
+        start = time.perf_counter()
+        response = client.post('/upload', data={
+            'file': (io.BytesIO(payload), 'bench.jpg'),
+            'folder_id': str(folder_id)
+        }, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+        error = (response.get_json(silent=True) or {}).get('error', '')
+        results.append((elapsed, response.status_code == 200, 'locked' in str(error)))
+    result_queue.put(('upload', results))
+
+
+def reader_worker(work_dir, profile, folder_ids, barrier, stop_event, result_queue):
+    app = load_app(work_dir, profile)
+    client = login(app)
+    barrier.wait()
+
+    results = []
+    i = 0
+    while not stop_event.is_set():
+        start = time.perf_counter()
+        try:
+            response = client.get(f'/api/folder/{folder_ids[i % len(folder_ids)]}/images')
+            ok, locked = response.status_code == 200, False
+        except Exception as e:
+            ok, locked = False, 'locked' in str(e)
+        results.append((time.perf_counter() - start, ok, locked))
+        i += 1
+    result_queue.put(('read', results))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+
+def run_profile(profile, args):
+    work_dir = tempfile.mkdtemp()
+    try:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=setup, args=(work_dir, profile, args.workers, queue))
+        process.start()
+        folder_ids, journal_mode = queue.get()
+        process.join()
+
+        barrier = multiprocessing.Barrier(args.workers + args.readers + 1)
+        stop_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(target=upload_worker,
+                                    args=(work_dir, profile, folder_id, args.uploads, barrier, queue))
+            for folder_id in folder_ids
+        ] + [
+            multiprocessing.Process(target=reader_worker,
+                                    args=(work_dir, profile, folder_ids, barrier, stop_event, queue))
+            for _ in range(args.readers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        start = time.perf_counter()
+
+        results = {'upload': [], 'read': []}
+        for _ in range(args.workers):
+            kind, items = queue.get()
+            results[kind].extend(items)
+        elapsed = time.perf_counter() - start
+        stop_event.set()
+        for _ in range(args.readers):
+            kind, items = queue.get()
+            results[kind].extend(items)
+        for process in processes:
+            process.join()
+    finally:
+        shutil.rmtree(work_dir)
+
+    print(f"{profile} (journal_mode={journal_mode})")
+    for kind, items in results.items():
+        if not items:
+            continue
+        latencies = [item[0] * 1000 for item in items]
+        failed = sum(1 for item in items if not item[1])
+        locked = sum(1 for item in items if item[2])
+        print(f"  {kind:6s} {len(items):6d} 次  失败 {failed / len(items):6.1%}  "
+              f"database is locked {locked / len(items):6.1%}  "
+              f"p50 {percentile(latencies, 0.5):8.1f} ms  p99 {percentile(latencies, 0.99):8.1f} ms")
+    print(f"  上传吞吐量 {len(results['upload']) / elapsed:.1f} 次/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help='同时上传的进程数')
+    parser.add_argument('--uploads', type=int, default=50, help='每个进程的上传次数')
+    parser.add_argument('--readers', type=int, default=2, help='同时浏览图片列表的进程数')
+    parser.add_argument('--profile', choices=list(PROFILES), action='append',
+                        help='只测试指定的设置，可以重复，默认全部')
+    args = parser.parse_args()
+
+    for profile in args.profile or list(PROFILES):
+        run_profile(profile, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+上传哈希基准测试：比较写入时计算哈希与写入后再读取计算哈希的吞吐量
+
+用法:
+    python benchmarks/bench_upload_hash.py [--size-mb 8 --files 20]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.datastructures import FileStorage
+
+from storage import compute_file_hash, save_stream_with_hash
+
+
+def make_upload(payload):
+    """模拟 Werkzeug 解析后的上传文件（已缓存在临时文件中）"""
+    spool = tempfile.TemporaryFile()
+    spool.write(payload)
+    spool.seek(0)
+    return FileStorage(stream=spool, filename='upload.jpg')
+
+
+def hash_after_write(upload, path):
+    """旧方式：先保存文件，再重新读取计算哈希"""
+    upload.save(path)
+    return compute_file_hash(path)
+
+
+def hash_on_write(upload, path):
+    """新方式：写入时同时计算哈希"""
+    digest, _ = save_stream_with_hash(upload.stream, path)
+    return digest
+
+
+def bench(func, payloads, work_dir):
+    total = 0.0
+    digests = []
+    for i, payload in enumerate(payloads):
+        upload = make_upload(payload)
+        path = os.path.join(work_dir, f"{func.__name__}_{i}.jpg")
+        start = time.perf_counter()
+        digests.append(func(upload, path))
+        total += time.perf_counter() - start
+        upload.stream.close()
+    return total, digests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size-mb', type=float, default=8)
+    parser.add_argument('--files', type=int, default=20)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    payloads = [os.urandom(size) for _ in range(args.files)]
+    total_mb = size * args.files / 1024 / 1024
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        results = {}
+        for func in (hash_after_write, hash_on_write):
+            elapsed, digests = bench(func, payloads, work_dir)
+            results[func.__name__] = digests
+            print(f"{func.__name__:18s} {elapsed * 1000:9.1f} ms  "
+                  f"{total_mb / elapsed:8.1f} MB/s  "
+                  f"{elapsed / args.files * 1000:7.2f} ms/文件")
+        print(f"哈希结果一致: {results['hash_after_write'] == results['hash_on_write']}")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+比较两次基准测试结果，p50 延迟变慢或吞吐量下降超过阈值时以非零状态退出
+
+用法:
+    python benchmarks/compare_results.py 旧结果.json 新结果.json [--threshold 0.1]
+
+两个文件应由同一个测试脚本、相同参数生成
+"""
+import argparse
+import json
+import sys
+
+# (字段, 越大越好)
+METRICS = [
+    ('p50_ms', False),
+    ('p95_ms', False),
+    ('ops_per_second', True),
+]
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline', help='作为基准的旧结果')
+    parser.add_argument('current', help='新结果')
+    parser.add_argument('--threshold', type=float, default=0.1, help='允许的变化比例，默认 10%%')
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    if baseline['suite'] != current['suite']:
+        print(f"测试不同: {baseline['suite']} / {current['suite']}")
+        sys.exit(2)
+    if baseline['params'] != current['params']:
+        print("警告: 两次测试的参数不同")
+    print(f"{baseline['suite']}: {(baseline['environment']['commit'] or '?')[:12]} -> "
+          f"{(current['environment']['commit'] or '?')[:12]}")
+
+    regressions = []
+    for name, old in baseline['results'].items():
+        new = current['results'].get(name)
+        if not new or not old.get('count') or not new.get('count'):
+            continue
+        for field, higher_is_better in METRICS:
+            if not old[field]:
+                continue
+            change = (new[field] - old[field]) / old[field]
+            worse = -change if higher_is_better else change
+            mark = '回退' if worse > args.threshold else ('改善' if worse < -args.threshold else '')
+            print(f"  {name:20s} {field:15s} {old[field]:10.2f} -> {new[field]:10.2f}  {change:+7.1%}  {mark}")
+            if worse > args.threshold:
+                regressions.append(f"{name}.{field}")
+        if new.get('errors', 0) > old.get('errors', 0):
+            print(f"  {name:20s} 失败次数 {old.get('errors', 0)} -> {new['errors']}")
+            regressions.append(f"{name}.errors")
+
+    if regressions:
+        print(f"性能回退: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+生成基准测试使用的合成 JPEG：按固定随机种子生成，每次内容相同，结果可以在不同提交之间比较。
+EXIF 包含相机、镜头、曝光参数、拍摄时间和 GPS，接近手机和相机拍摄的照片
+
+用法:
+    python benchmarks/corpus.py 输出目录 [--count 50 --width 1600 --height 1200 --seed 0]
+
+其他基准测试脚本直接导入 make_corpus / make_jpeg_bytes
+"""
+import argparse
+import io
+import os
+import random
+
+import piexif
+from PIL import Image
+
+CAMERAS = [
+    (b'Apple', b'iPhone 15 Pro', b'iPhone 15 Pro back triple camera 6.86mm f/1.78'),
+    (b'SONY', b'ILCE-7M4', b'FE 24-70mm F2.8 GM II'),
+    (b'Canon', b'Canon EOS R6', b'RF24-105mm F4 L IS USM'),
+    (b'NIKON CORPORATION', b'NIKON Z 6_2', b'NIKKOR Z 50mm f/1.8 S'),
+    (b'FUJIFILM', b'X-T5', b'XF16-55mmF2.8 R LM WR'),
+    (b'Xiaomi', b'2304FPN6DC', b''),
+]
+EXPOSURE_TIMES = [(1, 4000), (1, 1000), (1, 250), (1, 125), (1, 60), (1, 30), (1, 8)]
+F_NUMBERS = [(14, 10), (18, 10), (28, 10), (40, 10), (56, 10), (80, 10), (110, 10)]
+ISO_VALUES = [50, 100, 200, 400, 800, 1600, 3200, 6400]
+FOCAL_LENGTHS = [(686, 100), (24, 1), (35, 1), (50, 1), (70, 1), (105, 1)]
+
+
+def _dms(value):
+    """十进制度数转换为 EXIF 的 (度, 分, 秒) 有理数"""
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60 * 100)
+    return ((degrees, 1), (minutes, 1), (seconds, 100))
+
+
+def make_exif_bytes(rng, index, width, height):
+    """
+    生成一张照片的 EXIF
+
+    参数:
+        rng: random.Random 实例
+        index: 图片序号，写入描述中
+        width, height: 图片尺寸
+    返回:
+        EXIF 字节
+    """
+    make, model, lens = rng.choice(CAMERAS)
+    taken = (f"{rng.randint(2018, 2025)}:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} "
+             f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}").encode()
+    latitude = rng.uniform(-60, 60)
+    longitude = rng.uniform(-180, 180)
+
+    exif_ifd = {
+        piexif.ExifIFD.DateTimeOriginal: taken,
+        piexif.ExifIFD.DateTimeDigitized: taken,
+        piexif.ExifIFD.ExposureTime: rng.choice(EXPOSURE_TIMES),
+        piexif.ExifIFD.FNumber: rng.choice(F_NUMBERS),
+        piexif.ExifIFD.ISOSpeedRatings: rng.choice(ISO_VALUES),
+        piexif.ExifIFD.FocalLength: rng.choice(FOCAL_LENGTHS),
+        piexif.ExifIFD.ExposureProgram: rng.randint(0, 4),
+        piexif.ExifIFD.Flash: rng.choice([0, 16, 24]),
+        piexif.ExifIFD.PixelXDimension: width,
+        piexif.ExifIFD.PixelYDimension: height,
+        piexif.ExifIFD.UserComment: b'ASCII\0\0\0' + f'photo {index}'.encode(),
+    }
+    if lens:
+        exif_ifd[piexif.ExifIFD.LensModel] = lens
+
+    return piexif.dump({
+        '0th': {
+            piexif.ImageIFD.Make: make,
+            piexif.ImageIFD.Model: model,
+            piexif.ImageIFD.Orientation: 1,
+            piexif.ImageIFD.Software: b'web_pics_M benchmark',
+            piexif.ImageIFD.DateTime: taken,
+            piexif.ImageIFD.ImageDescription: f'Synthetic photo {index}'.encode(),
+            piexif.ImageIFD.XResolution: (72, 1),
+            piexif.ImageIFD.YResolution: (72, 1),
+        },
+        'Exif': exif_ifd,
+        'GPS': {
+            piexif.GPSIFD.GPSLatitudeRef: b'N' if latitude >= 0 else b'S',
+            piexif.GPSIFD.GPSLatitude: _dms(latitude),
+            piexif.GPSIFD.GPSLongitudeRef: b'E' if longitude >= 0 else b'W',
+            piexif.GPSIFD.GPSLongitude: _dms(longitude),
+            piexif.GPSIFD.GPSAltitudeRef: 0,
+            piexif.GPSIFD.GPSAltitude: (rng.randint(0, 300000), 100),
+        },
+    })
+
+
+def make_jpeg_bytes(rng, index, width, height, quality=90):
+    """
+    生成一张带 EXIF 的 JPEG。底色随机，叠加噪点让压缩后的大小接近真实照片
+
+    返回:
+        JPEG 字节
+    """
+    color = tuple(rng.randint(0, 255) for _ in range(3))
+    noise = Image.effect_noise((width, height), 48).convert('RGB')
+    image = Image.blend(Image.new('RGB', (width, height), color), noise, 0.35)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality, exif=make_exif_bytes(rng, index, width, height))
+    return buffer.getvalue()
+
+
+def make_corpus(work_dir, count, width=1600, height=1200, seed=0):
+    """
+    在目录中生成测试图片，相同参数每次生成的内容相同
+
+    参数:
+        work_dir: 输出目录
+        count: 图片数量
+        width, height: 图片尺寸
+        seed: 随机种子
+    返回:
+        文件路径列表
+    """
+    # effect_noise 不受 random 模块控制，EXIF 和底色由 rng 决定
+    rng = random.Random(seed)
+    os.makedirs(work_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(work_dir, f'photo_{i:04d}.jpg')
+        with open(path, 'wb') as f:
+            f.write(make_jpeg_bytes(rng, i, width, height))
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = make_corpus(args.output, args.count, args.width, args.height, args.seed)
+    total_size = sum(os.path.getsize(p) for p in paths)
+    print(f"已生成 {len(paths)} 张图片, 平均 {total_size / len(paths) / 1024:.0f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+负载测试：在临时目录中启动 gunicorn 和后台任务工作进程，通过 HTTP 注册用户、创建文件夹，
+再用 corpus.py 生成的照片依次测量上传、浏览文件夹、获取原图和缩略图、修改 EXIF 的吞吐量和延迟，
+结果保存为 JSON
+
+用法:
+    python benchmarks/load_test.py [--workers 4 --users 8 --images 20 --requests 200 --output 结果.json]
+
+不指定 --output 时保存到 benchmarks/results/load_test-<提交>.json。
+临时目录中通过符号链接引用应用代码，数据库和上传的文件不会写入仓库目录
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from corpus import make_jpeg_bytes
+from results import print_results, save_results, summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 链接到临时目录的应用文件，应用按自身所在目录查找模板和文件
+APP_DIRS = ('templates', 'static', 'migrations')
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """不跟随重定向，302 作为结果返回，避免把重定向后的页面计入耗时"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Client:
+    """一个登录用户，保存自己的 Cookie"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect()
+        )
+
+    def request(self, method, path, data=None, files=None):
+        """
+        发送请求
+
+        参数:
+            data: 表单字段
+            files: {字段名: (文件名, 内容)}
+        返回:
+            (状态码, 响应内容)
+        """
+        headers = {}
+        body = None
+        if files:
+            body, headers['Content-Type'] = encode_multipart(data or {}, files)
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=120) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_app_dir(work_dir):
+    for name in os.listdir(ROOT):
+        if name.endswith('.py') or name in APP_DIRS:
+            os.symlink(os.path.join(ROOT, name), os.path.join(work_dir, name))
+
+
+def start_server(work_dir, port, workers, job_worker):
+    """启动 gunicorn 和后台任务工作进程，输出写入临时目录中的 server.log"""
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'app.db')}"
+    env.setdefault('SECRET_KEY', 'load-test')
+    log = open(os.path.join(work_dir, 'server.log'), 'w')
+    processes = [subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--timeout', '120', 'app:app'],
+        cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )]
+    if job_worker:
+        processes.append(subprocess.Popen(
+            [sys.executable, '-m', 'flask', '--app', 'app', 'jobs', 'work'],
+            cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT
+        ))
+    return processes
+
+
+def wait_until_ready(base_url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/login', timeout=5):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    raise RuntimeError('应用启动超时，查看临时目录中的 server.log')
+
+
+def seed_users(base_url, users):
+    """注册用户并各自创建一个文件夹，返回 [(Client, 文件夹ID)]"""
+    sessions = []
+    for i in range(users):
+        client = Client(base_url)
+        credentials = {'username': f'bench{i}', 'password': 'bench'}
+        client.request('POST', '/register', credentials)
+        client.request('POST', '/login', credentials)
+        client.request('POST', '/folder/create', {'name': 'bench'})
+        _, html = client.request('GET', '/')
+        folder_id = int(re.search(rb'/folder/(\d+)', html).group(1))
+        sessions.append((client, folder_id))
+    return sessions
+
+
+def run_scenario(tasks, concurrency):
+    """
+    并发执行一组请求
+
+    参数:
+        tasks: [(函数, 期望的状态码集合)]，函数返回 (状态码, 响应内容)
+        concurrency: 并发数
+    返回:
+        summarize() 的结果
+    """
+    def run(task):
+        func, expected = task
+        start = time.perf_counter()
+        try:
+            status, _ = func()
+        except OSError:
+            status = None
+        return time.perf_counter() - start, status in expected
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(run, tasks))
+    elapsed = time.perf_counter() - start
+    durations = [duration for duration, ok in outcomes if ok]
+    return summarize(durations, elapsed=elapsed, errors=len(outcomes) - len(durations))
+
+
+def list_images(client, folder_id):
+    _, body = client.request('GET', f'/api/folder/{folder_id}/images?limit=200')
+    return json.loads(body)['images']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn 工作进程数')
+    parser.add_argument('--users', type=int, default=8, help='并发用户数，每个用户一个文件夹')
+    parser.add_argument('--images', type=int, default=20, help='测试照片数量，上传时附加不同的尾部数据避免去重')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数')
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-job-worker', action='store_true', help='不启动后台任务工作进程')
+    parser.add_argument('--output', help='结果文件路径')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_jpeg_bytes(rng, i, args.width, args.height) for i in range(args.images)]
+    print(f"测试照片: {len(corpus)} 张, 平均 {sum(map(len, corpus)) / len(corpus) / 1024:.0f} KB")
+
+    work_dir = tempfile.mkdtemp()
+    processes = []
+    try:
+        prepare_app_dir(work_dir)
+        port = free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        processes = start_server(work_dir, port, args.workers, not args.no_job_worker)
+        wait_until_ready(base_url)
+        sessions = seed_users(base_url, args.users)
+
+        results = {}
+
+        def upload_task(i):
+            client, folder_id = sessions[i % len(sessions)]
+            # JPEG 结束标记之后的数据不影响解码，每次上传的内容都不同
+            content = corpus[i % len(corpus)] + f'load-test-{i}'.encode()
+            return lambda: client.request('POST', '/upload', {'folder_id': folder_id},
+                                          {'file': (f'photo_{i}.jpg', content)})
+        results['upload'] = run_scenario(
+            [(upload_task(i), {200}) for i in range(args.requests)], args.users)
+
+        images = [(client, image) for client, folder_id in sessions
+                  for image in list_images(client, folder_id)]
+        if not images:
+            raise RuntimeError('上传失败，没有可用的图片')
+
+        def session_task(i, path):
+            client, folder_id = sessions[i % len(sessions)]
+            return lambda: client.request('GET', path.format(folder_id=folder_id))
+
+        def image_task(i, method, path, data=None):
+            client, image = images[i % len(images)]
+            return lambda: client.request(method, path.format(**image), data)
+
+        results['folder_view'] = run_scenario(
+            [(session_task(i, '/folder/{folder_id}'), {200}) for i in range(args.requests)], args.users)
+        results['folder_images'] = run_scenario(
+            [(session_task(i, '/api/folder/{folder_id}/images'), {200}) for i in range(args.requests)],
+            args.users)
+        results['image_fetch'] = run_scenario(
+            [(image_task(i, 'GET', '{url}'), {200}) for i in range(args.requests)], args.users)
+        results['thumbnail'] = run_scenario(
+            [(image_task(i, 'GET', '{thumbnail_url}'), {200}) for i in range(args.requests)], args.users)
+        # 修改成功和失败都重定向回编辑页面
+        results['exif_edit'] = run_scenario(
+            [(image_task(i, 'POST', '/api/exif/{id}/add', {'tag_value': f'load test {i}'}), {302})
+             for i in range(args.requests)], args.users)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        shutil.rmtree(work_dir)
+
+    print_results(results)
+    print(f"结果已保存: {save_results('load_test', vars(args), results, args.output)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+路由查询次数检查：在临时数据库中准备一张图片，依次请求各个路由，
+统计每个请求执行的 SQL 语句数，超过预算时以非零状态退出，用于发现 N+1 查询
+
+用法:
+    python benchmarks/query_budget.py [--verbose]
+
+预算包含 Flask-Login 加载当前用户的 1 次查询
+"""
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# (名称, 方法, 地址, 表单数据, 预算)，地址中的 {image_id}、{folder_id}、{filename} 在运行时替换。
+# 修改图片的路由放在后面，删除图片放在最后
+ROUTES = [
+    ('index', 'GET', '/', None, 2),
+    ('view_folder', 'GET', '/folder/{folder_id}', None, 2),
+    ('list_folder_images', 'GET', '/api/folder/{folder_id}/images', None, 3),
+    ('thumbnail', 'GET', '/thumbnail/{image_id}/256', None, 2),
+    ('uploaded_file', 'GET', '/image/{user_id}/{folder_id}/{filename}', None, 2),
+    ('uploads', 'GET', '/uploads/{user_id}/{folder_id}/{filename}', None, 2),
+    ('edit_exif', 'GET', '/edit/image/{image_id}', None, 3),
+    ('get_exif', 'GET', '/api/exif/{filename}', None, 3),
+    ('image_status', 'GET', '/api/image/{image_id}/status', None, 3),
+    ('export_exif', 'GET', '/api/folder/{folder_id}/exif/export?format=jsonl', None, 4),
+    ('download_folder', 'GET', '/folder/{folder_id}/download', None, 3),
+    ('update_exif_by_filename', 'POST', '/api/exif/{filename}', 'json', 2),
+    ('update_exif', 'POST', '/edit/image/{image_id}/update', {'tag_name': 'a', 'tag_value': 'b'}, 2),
+    ('update_exif_by_image_id', 'POST', '/image/{image_id}/update', {'tag_name': 'a', 'tag_value': 'b'}, 2),
+    ('add_exif_tag', 'POST', '/api/exif/{image_id}/add', {'tag_value': 'budget'}, 11),
+    ('delete_exif_tag', 'POST', '/api/exif/{image_id}/delete/0th.010e', None, 11),
+    ('rename_image', 'POST', '/rename_image', {'image_id': '{image_id}', 'new_filename': 'renamed'}, 3),
+    ('delete_image', 'POST', '/folder/{folder_id}/image/{image_id}/delete', None, 13),
+]
+
+
+def make_jpeg():
+    """带 EXIF 的小图片"""
+    import piexif
+    from PIL import Image as PILImage
+
+    exif_bytes = piexif.dump({'0th': {
+        piexif.ImageIFD.Make: b'Budget',
+        piexif.ImageIFD.ImageDescription: b'query budget',
+    }})
+    buffer = io.BytesIO()
+    PILImage.new('RGB', (64, 48), (200, 120, 40)).save(buffer, 'JPEG', exif=exif_bytes)
+    return buffer.getvalue()
+
+
+def prepare(app):
+    """注册用户、创建文件夹、上传图片并执行后台任务，返回地址中使用的参数"""
+    from jobs import claim_job, run_job
+    from models import Folder, Image
+
+    client = app.test_client()
+    client.post('/register', data={'username': 'budget', 'password': 'budget'})
+    client.post('/login', data={'username': 'budget', 'password': 'budget'})
+    client.post('/folder/create', data={'name': 'budget'})
+    with app.app_context():
+        folder = Folder.query.filter_by(name='budget').first()
+        folder_id, user_id = folder.id, folder.user_id
+    client.post('/upload', data={
+        'file': (io.BytesIO(make_jpeg()), 'budget.jpg'),
+        'folder_id': str(folder_id)
+    }, content_type='multipart/form-data')
+
+    with app.app_context():
+        while True:
+            job = claim_job()
+            if job is None:
+                break
+            run_job(job)
+        image = Image.query.filter_by(folder_id=folder_id).first()
+        params = {'image_id': image.id, 'folder_id': folder_id, 'user_id': user_id,
+                  'filename': image.filename}
+    return client, params
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--verbose', action='store_true', help='输出每个请求执行的 SQL')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp()
+    os.chdir(work_dir)
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(work_dir, 'app.db')}"
+    os.environ.setdefault('SECRET_KEY', 'budget')
+    # 屏蔽应用的调试输出，只保留结果
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+
+    from sqlalchemy import event
+    from app import app
+    from models import db
+
+    app.config['TESTING'] = True
+    # send_file 按应用目录解析相对路径，这里改为临时目录中的绝对路径
+    for key in ('UPLOAD_FOLDER', 'BLOB_FOLDER', 'THUMBNAIL_FOLDER'):
+        app.config[key] = os.path.join(work_dir, app.config[key])
+    client, params = prepare(app)
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sys.stdout = stdout
+    exceeded = []
+    for name, method, url, data, budget in ROUTES:
+        url = url.format(**params)
+        if data == 'json':
+            kwargs = {'json': {'tag': 'value'}}
+        elif data:
+            kwargs = {'data': {key: value.format(**params) for key, value in data.items()}}
+        else:
+            kwargs = {}
+        statements.clear()
+        response = client.open(url, method=method, **kwargs)
+        # 流式响应在读取内容时才执行查询
+        response.get_data()
+        count = len(statements)
+        status = '通过' if count <= budget else '超出预算'
+        print(f"{name:26s} {response.status_code:4d}  查询 {count:3d} / 预算 {budget:3d}  {status}")
+        if args.verbose:
+            for statement in statements:
+                print('    ' + ' '.join(statement.split())[:160])
+        if count > budget:
+            exceeded.append(name)
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    if exceeded:
+        print(f"超出查询预算: {', '.join(exceeded)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
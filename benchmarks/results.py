@@ -0,0 +1,100 @@
+"""
+基准测试结果的统计和保存。结果保存为 JSON，包含提交、运行环境和参数，
+用 compare_results.py 比较两次结果即可发现性能回退
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def summarize(durations, elapsed=None, errors=0):
+    """
+    统计一组耗时
+
+    参数:
+        durations: 每次操作的耗时（秒）
+        elapsed: 并发执行时的总耗时（秒），用于计算吞吐量；为空时按耗时之和计算
+        errors: 失败次数
+    返回:
+        字典，时间单位为毫秒
+    """
+    if not durations:
+        return {'count': 0, 'errors': errors}
+    values = sorted(durations)
+
+    def percentile(p):
+        return values[min(int(len(values) * p), len(values) - 1)] * 1000
+
+    total = elapsed if elapsed is not None else sum(values)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'mean_ms': statistics.fmean(values) * 1000,
+        'stddev_ms': statistics.pstdev(values) * 1000,
+        'min_ms': values[0] * 1000,
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': values[-1] * 1000,
+        'ops_per_second': len(values) / total if total else 0.0,
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """当前提交和运行环境，比较结果时确认两次是在相同条件下运行的"""
+    return {
+        'commit': _git('rev-parse', 'HEAD'),
+        'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def save_results(suite, params, results, path=None):
+    """
+    保存结果
+
+    参数:
+        suite: 测试名称
+        params: 命令行参数字典
+        results: {测试项: summarize() 的结果}
+        path: 输出文件，为空时保存到 benchmarks/results/<测试名称>-<提交>.json
+    返回:
+        输出文件路径
+    """
+    env = environment()
+    # 输出路径不影响结果，比较时不需要一致
+    params = {key: value for key, value in params.items() if key != 'output'}
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{suite}-{(env['commit'] or 'unknown')[:12]}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'suite': suite, 'environment': env, 'params': params, 'results': results},
+                  f, ensure_ascii=False, indent=2)
+    return path
+
+
+def print_results(results):
+    for name, r in results.items():
+        if not r.get('count'):
+            print(f"{name:20s} 没有成功的操作, 失败 {r.get('errors', 0)}")
+            continue
+        print(f"{name:20s} {r['count']:6d} 次  失败 {r['errors']:4d}  {r['ops_per_second']:8.1f} 次/秒  "
+              f"p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms")
@@ -0,0 +1,261 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import piexif
+from flask import current_app
+from PIL import Image as PILImage
+
+from exif_index import index_image_exif
+from exif_utils import EXIF_IFD_NAMES, write_exif
+from jobs import enqueue, task
+from models import db, BulkExifEdit, Image, Job
+from storage import (
+    compute_file_hash, get_blob_path, get_image_path, new_staging_path, replace_image_content, remove_files
+)
+from thumbnails import invalidate_thumbnails
+
+# 每处理这么多张图片提交一次进度
+PROGRESS_BATCH_SIZE = 50
+
+
+def parse_exif_operations(operations):
+    """
+    校验批量修改的操作列表
+
+    支持的操作:
+        {"op": "remove_ifd", "ifd": "GPS"}            删除整个 IFD，如清除位置信息
+        {"op": "remove_tag", "tag": "0th.010f"}       删除单个标签，格式与 delete_exif_tag 相同
+        {"op": "set_user_comment", "value": "文本"}   设置 UserComment
+
+    参数:
+        operations: 客户端提交的操作列表
+    返回:
+        规范化后的操作列表
+    异常:
+        ValueError: 操作无效
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('缺少操作')
+
+    result = []
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValueError('无效的操作')
+        op = operation.get('op')
+        if op == 'remove_ifd':
+            ifd = operation.get('ifd')
+            if ifd not in EXIF_IFD_NAMES:
+                raise ValueError(f"无效的 IFD: {ifd}")
+            result.append({'op': op, 'ifd': ifd})
+        elif op == 'remove_tag':
+            parts = str(operation.get('tag', '')).split('.')
+            if len(parts) != 2 or parts[0] not in EXIF_IFD_NAMES:
+                raise ValueError(f"无效的标签ID: {operation.get('tag')}")
+            try:
+                tag_id = int(parts[1], 16)
+            except ValueError:
+                raise ValueError(f"无效的标签ID: {operation.get('tag')}")
+            result.append({'op': op, 'ifd': parts[0], 'tag_id': tag_id})
+        elif op == 'set_user_comment':
+            value = operation.get('value')
+            if not isinstance(value, str) or not value:
+                raise ValueError('标签值不能为空')
+            result.append({'op': op, 'value': value})
+        else:
+            raise ValueError(f"不支持的操作: {op}")
+    return result
+
+
+def apply_exif_operations(source_path, output_path, operations):
+    """
+    在子进程中执行：按操作列表修改EXIF，结果写入 output_path
+
+    参数:
+        source_path: 原图路径
+        output_path: 输出的临时文件路径
+        operations: parse_exif_operations 返回的操作列表
+    返回:
+        新文件的哈希值，EXIF没有变化时返回 None（不写入文件）
+    """
+    # 只解析文件头，不解码图像
+    with PILImage.open(source_path) as img:
+        image_format = img.format
+        exif_data = img.info.get('exif')
+
+    if image_format not in ('JPEG', 'TIFF'):
+        raise ValueError(f"图片格式 {image_format} 不支持EXIF数据")
+
+    if exif_data:
+        exif_dict = piexif.load(exif_data)
+    else:
+        exif_dict = {'0th': {}, 'Exif': {}, 'GPS': {}, 'Interop': {}, '1st': {}, 'thumbnail': None}
+
+    changed = False
+    for operation in operations:
+        op = operation['op']
+        if op == 'remove_ifd':
+            if exif_dict.get(operation['ifd']):
+                exif_dict[operation['ifd']] = {}
+                changed = True
+                if operation['ifd'] == '1st':
+                    exif_dict['thumbnail'] = None
+        elif op == 'remove_tag':
+            ifd = exif_dict.get(operation['ifd'], {})
+            if operation['tag_id'] in ifd:
+                del ifd[operation['tag_id']]
+                changed = True
+        elif op == 'set_user_comment':
+            # 与 add_exif_tag 相同：前8字节为字符集标识
+            comment = b'ASCII\0\0\0' + operation['value'].encode('utf-8', errors='replace')
+            exif_ifd = exif_dict.setdefault('Exif', {})
+            if exif_ifd.get(piexif.ExifIFD.UserComment) != comment:
+                exif_ifd[piexif.ExifIFD.UserComment] = comment
+                changed = True
+
+    if not changed:
+        return None
+
+    write_exif(source_path, piexif.dump(exif_dict), output_path=output_path)
+    return compute_file_hash(output_path)
+
+
+def create_bulk_exif_edit(user_id, image_ids, operations):
+    """
+    创建批量修改记录并加入后台任务队列（不提交事务）
+
+    参数:
+        user_id: 用户ID
+        image_ids: 已检查过权限的图片ID列表
+        operations: parse_exif_operations 返回的操作列表
+    返回:
+        BulkExifEdit 记录
+    """
+    bulk_edit = BulkExifEdit(
+        user_id=user_id,
+        operations=operations,
+        image_ids=image_ids,
+        total=len(image_ids),
+        results=[]
+    )
+    db.session.add(bulk_edit)
+    db.session.flush()
+    enqueue('bulk_exif_edit', payload={'bulk_edit_id': bulk_edit.id}, max_attempts=3)
+    return bulk_edit
+
+
+def get_bulk_exif_edit_status(bulk_edit):
+    """返回批量修改的进度和每个文件的结果"""
+    processed = bulk_edit.updated + bulk_edit.unchanged + bulk_edit.errors
+    return {
+        'id': bulk_edit.id,
+        'status': bulk_edit.status,
+        'total': bulk_edit.total,
+        'processed': processed,
+        'updated': bulk_edit.updated,
+        'unchanged': bulk_edit.unchanged,
+        'errors': bulk_edit.errors,
+        'results': bulk_edit.results,
+        'created_at': bulk_edit.created_at.isoformat() if bulk_edit.created_at else None,
+        'finished_at': bulk_edit.finished_at.isoformat() if bulk_edit.finished_at else None,
+    }
+
+
+def _record_results(bulk_edit, results):
+    bulk_edit.results = list(bulk_edit.results) + results
+    for result in results:
+        if result['status'] == 'updated':
+            bulk_edit.updated += 1
+        elif result['status'] == 'unchanged':
+            bulk_edit.unchanged += 1
+        else:
+            bulk_edit.errors += 1
+
+
+@task('bulk_exif_edit')
+def bulk_exif_edit_task(job):
+    """
+    用进程池并行修改EXIF，主进程只负责更新数据库。
+    进度每批提交一次，任务中断重试时跳过已有结果的图片
+    """
+    bulk_edit = db.session.get(BulkExifEdit, job.payload['bulk_edit_id'])
+    if bulk_edit is None:
+        return
+
+    done_ids = {result['image_id'] for result in bulk_edit.results}
+    pending_ids = [image_id for image_id in bulk_edit.image_ids if image_id not in done_ids]
+    bulk_edit.status = 'running'
+    db.session.commit()
+
+    try:
+        _process_bulk_exif_edit(job, bulk_edit, pending_ids)
+    except Exception:
+        # 最后一次尝试也失败时标记为失败，否则保持 running 等待重试
+        if job.attempts + 1 >= job.max_attempts:
+            db.session.rollback()
+            bulk_edit = db.session.get(BulkExifEdit, job.payload['bulk_edit_id'])
+            bulk_edit.status = 'failed'
+            bulk_edit.finished_at = datetime.utcnow()
+            db.session.commit()
+        raise
+
+
+def _process_bulk_exif_edit(job, bulk_edit, pending_ids):
+    results = []
+    orphaned = []
+    tasks = {}
+    with ProcessPoolExecutor(max_workers=current_app.config['BULK_EXIF_WORKERS']) as pool:
+        for image in Image.query.filter(Image.id.in_(pending_ids)).all():
+            temp_path = new_staging_path()
+            future = pool.submit(apply_exif_operations, get_image_path(image), temp_path,
+                                 bulk_edit.operations)
+            tasks[future] = (image.id, temp_path)
+
+        # 创建批量修改后图片可能已被删除
+        found_ids = {image_id for image_id, _ in tasks.values()}
+        for image_id in pending_ids:
+            if image_id not in found_ids:
+                results.append({'image_id': image_id, 'status': 'error', 'error': '图片不存在'})
+
+        for future in as_completed(tasks):
+            image_id, temp_path = tasks[future]
+            image = db.session.get(Image, image_id)
+            new_hash = None
+            try:
+                new_hash = future.result()
+                if image is None:
+                    raise ValueError('图片不存在')
+                if new_hash is None:
+                    results.append({'image_id': image_id, 'status': 'unchanged'})
+                else:
+                    # 每张图片一个保存点，出错时只回滚这张图片的修改，不影响同一批的其他图片
+                    with db.session.begin_nested():
+                        # 文件内容已改变，更新哈希、索引并重新生成缩略图
+                        invalidate_thumbnails(image)
+                        image_orphaned = replace_image_content(image, temp_path, new_hash)
+                        index_image_exif(image)
+                        enqueue('thumbnails', image)
+                    orphaned.extend(image_orphaned)
+                    results.append({'image_id': image_id, 'status': 'updated'})
+            except Exception as e:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                # 回滚后新内容没有 Blob 记录时，已移入的文件在提交后一并删除
+                if new_hash:
+                    orphaned.append(get_blob_path(new_hash))
+                results.append({'image_id': image_id, 'status': 'error', 'error': str(e)})
+
+            if len(results) >= PROGRESS_BATCH_SIZE:
+                _record_results(bulk_edit, results)
+                # 更新领取时间，避免修改大量图片超过 JOB_TIMEOUT 后被其他工作进程重复领取
+                Job.query.filter_by(id=job.id).update({'locked_at': datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+                remove_files(orphaned)
+                results = []
+                orphaned = []
+
+    _record_results(bulk_edit, results)
+    bulk_edit.status = 'done'
+    bulk_edit.finished_at = datetime.utcnow()
+    db.session.commit()
+    remove_files(orphaned)
@@ -0,0 +1,412 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+import zipfile
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import insert
+from werkzeug.utils import secure_filename
+
+from jobs import IMAGE_PROCESSING_TASKS, enqueue, task
+from models import db, Blob, Folder, Image, ImportRun, Job, User
+from storage import (
+    CHUNK_SIZE, UPSERT_INSERTS, blob_relative_path, get_blob_path, get_staging_dir, new_staging_path
+)
+
+import_cli = AppGroup('import', help='从服务器上的目录或 ZIP 批量导入图片')
+
+# Folder.name 的最大长度
+FOLDER_NAME_MAX = 80
+
+# 导入的一个文件: 目标文件夹名、原始文件名、目录路径或 ZIP 路径、ZIP 中的成员名（目录导入时为 None）
+ImportEntry = namedtuple('ImportEntry', 'folder_name filename source member')
+
+# 子进程中缓存打开的 ZIP，避免每个文件都重新读取中央目录
+_open_zips = {}
+
+
+def _open_entry(source, member):
+    if member is None:
+        # 扫描之后文件被替换成符号链接时也不会读取导入目录以外的文件
+        return os.fdopen(os.open(source, os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0)), 'rb')
+    if source not in _open_zips:
+        _open_zips[source] = zipfile.ZipFile(source)
+    return _open_zips[source].open(member)
+
+
+def hash_import_file(source, member, blob_folder, staging_dir):
+    """
+    在子进程中执行：计算文件的哈希值，Blob 中还没有这个内容时再复制到临时文件。
+    重新导入时大部分文件已存在，只需要读取一次
+
+    参数:
+        source: 文件路径或 ZIP 路径
+        member: ZIP 中的成员名，导入目录时为 None
+        blob_folder: BLOB_FOLDER 的路径
+        staging_dir: 临时文件目录
+    返回:
+        (哈希值, 文件大小, 临时文件路径)，内容已存在时临时文件路径为 None
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    with _open_entry(source, member) as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            size += len(chunk)
+    file_hash = sha256.hexdigest()
+
+    temp_path = None
+    if not os.path.exists(os.path.join(blob_folder, blob_relative_path(file_hash))):
+        temp_path = os.path.join(staging_dir, f"{uuid.uuid4().hex}.tmp")
+        with _open_entry(source, member) as src, open(temp_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    return file_hash, size, temp_path
+
+
+def _folder_for(folder_name, directory):
+    # 子目录映射为 "<文件夹>/<子目录>"，超长时保留末尾部分并加上完整路径的哈希，
+    # 末尾相同的不同目录不会合并到同一个文件夹
+    name = f"{folder_name}/{directory}" if directory else folder_name
+    if len(name) <= FOLDER_NAME_MAX:
+        return name
+    suffix = f" ~{hashlib.sha1(name.encode('utf-8')).hexdigest()[:8]}"
+    return name[-(FOLDER_NAME_MAX - len(suffix)):] + suffix
+
+
+def _is_importable(name, extensions):
+    # 跳过隐藏文件和 macOS 压缩时附带的 __MACOSX 目录
+    parts = name.replace('\\', '/').split('/')
+    if any(part.startswith('.') or part == '__MACOSX' for part in parts):
+        return False
+    return '.' in parts[-1] and parts[-1].rsplit('.', 1)[1].lower() in extensions
+
+
+def scan_import_source(source, folder_name, extensions):
+    """
+    列出目录或 ZIP 中可以导入的图片，按路径排序，同一来源每次扫描的顺序相同。
+    目录中的符号链接会跳过，不会读取导入目录以外的文件
+
+    参数:
+        source: 目录或 ZIP 文件路径
+        folder_name: 顶层文件导入的文件夹名
+        extensions: 允许的扩展名
+    返回:
+        ImportEntry 列表
+    异常:
+        ValueError: 来源不是目录或 ZIP 文件
+    """
+    entries = []
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            directory = os.path.relpath(root, source).replace(os.sep, '/')
+            directory = '' if directory == '.' else directory
+            for name in sorted(files):
+                relative = f"{directory}/{name}" if directory else name
+                path = os.path.join(root, name)
+                if _is_importable(relative, extensions) and not os.path.islink(path):
+                    entries.append(ImportEntry(_folder_for(folder_name, directory), name, path, None))
+    elif os.path.isfile(source) and zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            for info in sorted(zf.infolist(), key=lambda info: info.filename):
+                if info.is_dir() or not _is_importable(info.filename, extensions):
+                    continue
+                directory, _, name = info.filename.rpartition('/')
+                entries.append(ImportEntry(_folder_for(folder_name, directory), name, source, info.filename))
+    else:
+        raise ValueError('导入来源必须是目录或 ZIP 文件')
+    return entries
+
+
+def _get_or_create_folders(user_id, names):
+    """返回 {文件夹名: 文件夹ID}，不存在的文件夹新建"""
+    folder_ids = {
+        folder.name: folder.id
+        for folder in Folder.query.filter(
+            Folder.user_id == user_id, Folder.pending_delete.is_(False), Folder.name.in_(names)
+        )
+    }
+    for name in sorted(set(names) - set(folder_ids)):
+        folder = Folder(name=name, user_id=user_id)
+        db.session.add(folder)
+        db.session.flush()
+        folder_ids[name] = folder.id
+    db.session.commit()
+    return folder_ids
+
+
+def _store_blobs(new_files):
+    """
+    批量增加 Blob 的引用计数并移入新文件（不提交事务）
+
+    参数:
+        new_files: [(ImportEntry, 哈希值, 大小, 临时文件路径)]，同一内容可能出现多次
+    """
+    counts = Counter(file_hash for _, file_hash, _, _ in new_files)
+    sizes = {file_hash: size for _, file_hash, size, _ in new_files}
+    # 与 store_blob 相同，插入和增加计数在一条语句中完成，与同时上传相同内容的请求不会主键冲突
+    dialect = db.session.get_bind().dialect.name
+    statement = UPSERT_INSERTS[dialect](Blob).values([
+        {'hash': blob_hash, 'size': sizes[blob_hash], 'ref_count': count}
+        for blob_hash, count in counts.items()
+    ])
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[Blob.hash], set_={'ref_count': Blob.ref_count + statement.excluded.ref_count}
+    ))
+
+    for entry, file_hash, size, temp_path in new_files:
+        blob_path = get_blob_path(file_hash)
+        if os.path.exists(blob_path):
+            if temp_path:
+                os.remove(temp_path)
+            continue
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        if temp_path:
+            os.replace(temp_path, blob_path)
+        else:
+            # 子进程检查后 Blob 文件被删除了，重新复制
+            temp_path = new_staging_path()
+            with _open_entry(entry.source, entry.member) as src, open(temp_path, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(temp_path, blob_path)
+
+
+def _save_batch(import_run, folder_ids, results, errors):
+    """
+    保存一批文件：按文件夹和哈希去重，批量写入 Blob、Image 和后台任务，与进度在同一事务中提交
+
+    参数:
+        import_run: ImportRun 记录
+        folder_ids: {文件夹名: 文件夹ID}
+        results: [(ImportEntry, 哈希值, 大小, 临时文件路径)]
+        errors: 出错的文件数
+    """
+    hashes = {file_hash for _, file_hash, _, _ in results}
+    existing = set()
+    if hashes:
+        existing = {(folder_id, file_hash) for folder_id, file_hash in db.session.query(
+            Image.folder_id, Image.file_hash
+        ).filter(Image.folder_id.in_(list(folder_ids.values())), Image.file_hash.in_(list(hashes)))}
+
+    new_files = []
+    for entry, file_hash, size, temp_path in results:
+        key = (folder_ids[entry.folder_name], file_hash)
+        if key in existing:
+            if temp_path:
+                os.remove(temp_path)
+            continue
+        existing.add(key)
+        new_files.append((entry, file_hash, size, temp_path))
+
+    if new_files:
+        _store_blobs(new_files)
+        now = datetime.utcnow()
+        # 多行插入时需要按参数顺序返回ID，PostgreSQL 会分批执行插入
+        image_ids = db.session.scalars(insert(Image).returning(Image.id, sort_by_parameter_order=True), [{
+            'filename': secure_filename(str(uuid.uuid4()) + os.path.splitext(entry.filename)[1]),
+            'original_filename': entry.filename,
+            'folder_id': folder_ids[entry.folder_name],
+            'user_id': import_run.user_id,
+            'file_hash': file_hash,
+            'blob_hash': file_hash,
+            'upload_date': now,
+        } for entry, file_hash, _, _ in new_files]).all()
+        # EXIF索引和缩略图与普通上传一样由工作进程处理
+        db.session.execute(insert(Job), [{
+            'task': task_name,
+            'image_id': image_id,
+            'payload': {},
+            'max_attempts': current_app.config['JOB_MAX_ATTEMPTS'],
+            'run_at': now,
+        } for image_id in image_ids for task_name in IMAGE_PROCESSING_TASKS])
+
+    import_run.imported += len(new_files)
+    import_run.skipped += len(results) - len(new_files)
+    import_run.errors += errors
+    db.session.commit()
+
+
+def run_import(import_run, workers, batch_size, on_batch=None):
+    """
+    执行导入。进度按批提交，中断后再次执行时从已处理的位置继续，
+    来源有变化时也会按内容哈希跳过已导入的文件
+
+    参数:
+        import_run: ImportRun 记录
+        workers: 计算哈希的进程数
+        batch_size: 每个事务处理的文件数
+        on_batch: 每批提交后调用，参数为 import_run
+    """
+    entries = scan_import_source(import_run.source, import_run.folder_name,
+                                 current_app.config['ALLOWED_EXTENSIONS'])
+    folder_ids = _get_or_create_folders(import_run.user_id, {entry.folder_name for entry in entries})
+
+    processed = import_run.imported + import_run.skipped + import_run.errors
+    import_run.total = len(entries)
+    import_run.status = 'running'
+    import_run.started_at = import_run.started_at or datetime.utcnow()
+    db.session.commit()
+
+    blob_folder = current_app.config['BLOB_FOLDER']
+    staging_dir = get_staging_dir()
+    batches = [entries[i:i + batch_size] for i in range(processed, len(entries), batch_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(batch):
+            return [pool.submit(hash_import_file, entry.source, entry.member, blob_folder, staging_dir)
+                    for entry in batch]
+
+        # 保存当前批时子进程已经在计算下一批的哈希
+        pending = submit(batches[0]) if batches else None
+        for index, batch in enumerate(batches):
+            futures = pending
+            pending = submit(batches[index + 1]) if index + 1 < len(batches) else None
+
+            results = []
+            errors = 0
+            for entry, future in zip(batch, futures):
+                try:
+                    results.append((entry, *future.result()))
+                except Exception as e:
+                    errors += 1
+                    import_run.last_error = f"{entry.member or entry.source}: {e}"
+            _save_batch(import_run, folder_ids, results, errors)
+            if on_batch:
+                on_batch(import_run)
+
+    import_run.status = 'done'
+    import_run.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def get_import_status(import_run):
+    """返回导入进度和处理速度"""
+    processed = import_run.imported + import_run.skipped + import_run.errors
+    end = import_run.finished_at or datetime.utcnow()
+    elapsed = (end - import_run.started_at).total_seconds() if import_run.started_at else 0
+    return {
+        'id': import_run.id,
+        'status': import_run.status,
+        'folder_name': import_run.folder_name,
+        'total': import_run.total,
+        'processed': processed,
+        'imported': import_run.imported,
+        'skipped': import_run.skipped,
+        'errors': import_run.errors,
+        'last_error': import_run.last_error,
+        'files_per_second': round(processed / elapsed, 1) if elapsed > 0 else None,
+        'created_at': import_run.created_at.isoformat() if import_run.created_at else None,
+        'finished_at': import_run.finished_at.isoformat() if import_run.finished_at else None,
+    }
+
+
+def create_import_run(user_id, source, folder_name=None, background=True):
+    """
+    创建导入记录（不提交事务）
+
+    参数:
+        user_id: 用户ID
+        source: 已检查过的目录或 ZIP 路径
+        folder_name: 顶层文件导入的文件夹名，默认使用来源的名称
+        background: 是否加入后台任务队列，命令行导入时直接执行
+    返回:
+        ImportRun 记录
+    """
+    if not folder_name:
+        folder_name = os.path.splitext(os.path.basename(os.path.normpath(source)))[0]
+    import_run = ImportRun(user_id=user_id, source=source, folder_name=folder_name[:FOLDER_NAME_MAX])
+    db.session.add(import_run)
+    db.session.flush()
+    if background:
+        enqueue('bulk_import', payload={'import_run_id': import_run.id}, max_attempts=3)
+    return import_run
+
+
+@task('bulk_import')
+def bulk_import_task(job):
+    """执行通过接口提交的导入，失败重试时从已提交的进度继续"""
+    import_run = db.session.get(ImportRun, job.payload['import_run_id'])
+    if import_run is None or import_run.status == 'done':
+        return
+
+    def heartbeat(_):
+        # 更新领取时间，避免导入超过 JOB_TIMEOUT 后被其他工作进程重复领取
+        Job.query.filter_by(id=job.id).update({'locked_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+    try:
+        run_import(import_run, current_app.config['IMPORT_WORKERS'],
+                   current_app.config['IMPORT_BATCH_SIZE'], on_batch=heartbeat)
+    except Exception as e:
+        # 最后一次尝试也失败时标记为失败
+        if job.attempts + 1 >= job.max_attempts:
+            db.session.rollback()
+            import_run = db.session.get(ImportRun, job.payload['import_run_id'])
+            import_run.status = 'failed'
+            import_run.last_error = str(e)
+            import_run.finished_at = datetime.utcnow()
+            db.session.commit()
+        raise
+
+
+def _print_progress(import_run):
+    status = get_import_status(import_run)
+    click.echo(f"已处理 {status['processed']}/{status['total']}: 导入 {status['imported']}，"
+               f"跳过 {status['skipped']}，错误 {status['errors']}，"
+               f"{status['files_per_second'] or 0} 个文件/秒")
+
+
+def _run_and_report(import_run, workers, batch_size):
+    workers = workers or current_app.config['IMPORT_WORKERS']
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    click.echo(f"导入 #{import_run.id}: {import_run.source} -> {import_run.folder_name} ({workers} 个进程)")
+    start = time.monotonic()
+    try:
+        run_import(import_run, workers, batch_size, on_batch=_print_progress)
+    except KeyboardInterrupt:
+        click.echo(f"已中断，运行 flask import resume {import_run.id} 继续")
+        raise SystemExit(1)
+    elapsed = time.monotonic() - start
+    click.echo(f"完成: 导入 {import_run.imported}，跳过 {import_run.skipped}，错误 {import_run.errors}，"
+               f"本次用时 {elapsed:.1f} 秒")
+    if import_run.last_error:
+        click.echo(f"最后一个错误: {import_run.last_error}")
+
+
+@import_cli.command('run')
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--user', 'username', required=True, help='导入到该用户')
+@click.option('--folder', 'folder_name', default=None, help='顶层文件导入的文件夹名，默认使用目录或 ZIP 的名称')
+@click.option('--workers', type=int, default=None, help='计算哈希的进程数，默认使用 IMPORT_WORKERS')
+@click.option('--batch-size', type=int, default=None, help='每个事务的文件数，默认使用 IMPORT_BATCH_SIZE')
+def run_command(source, username, folder_name, workers, batch_size):
+    """导入目录或 ZIP，子目录导入为单独的文件夹，已导入的相同内容会跳过"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.BadParameter(f"用户不存在: {username}", param_hint='--user')
+
+    import_run = create_import_run(user.id, os.path.abspath(source), folder_name, background=False)
+    db.session.commit()
+    _run_and_report(import_run, workers, batch_size)
+
+
+@import_cli.command('resume')
+@click.argument('import_run_id', type=int)
+@click.option('--workers', type=int, default=None, help='计算哈希的进程数，默认使用 IMPORT_WORKERS')
+@click.option('--batch-size', type=int, default=None, help='每个事务的文件数，默认使用 IMPORT_BATCH_SIZE')
+def resume_command(import_run_id, workers, batch_size):
+    """从已提交的进度继续一次中断的导入"""
+    import_run = db.session.get(ImportRun, import_run_id)
+    if import_run is None:
+        raise click.BadParameter(f"导入记录不存在: {import_run_id}")
+    if import_run.status == 'done':
+        click.echo("该导入已完成")
+        return
+    _run_and_report(import_run, workers, batch_size)
@@ -0,0 +1,78 @@
+import os
+
+from sqlalchemy import event
+
+from models import db
+
+# 每个新的 SQLite 连接执行的 PRAGMA。多个 gunicorn 进程同时写入时:
+#   journal_mode=WAL      读写互不阻塞，只有写入之间需要排队
+#   synchronous=NORMAL    WAL 模式下只在检查点时 fsync，断电最多丢失最后几个事务，不会损坏数据库
+#   busy_timeout          等待其他进程释放写锁的毫秒数，超时才报 database is locked
+#   cache_size            负数单位为 KiB，每个连接 64MB 页缓存
+#   mmap_size             用内存映射读取数据库文件，减少 read 系统调用
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 30000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+def normalize_database_url(url):
+    """
+    部分托管服务提供的地址以 postgres:// 开头，SQLAlchemy 只识别 postgresql://
+
+    参数:
+        url: 数据库地址
+    返回:
+        SQLAlchemy 可以使用的数据库地址
+    """
+    if url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def get_engine_options(database_uri):
+    """
+    数据库服务器的连接池设置。每个 gunicorn 工作进程有自己的连接池，
+    总连接数最多为 工作进程数 × (DB_POOL_SIZE + DB_MAX_OVERFLOW)，需要小于数据库的 max_connections
+
+    参数:
+        database_uri: 数据库地址
+    返回:
+        SQLALCHEMY_ENGINE_OPTIONS 字典，SQLite 使用默认设置，返回空字典
+    """
+    if database_uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # 数据库或中间的代理可能关闭空闲连接，使用前检查并定期更换
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+    }
+
+
+def configure_sqlite(app):
+    """
+    为 SQLite 连接注册 PRAGMA 设置，在 db.init_app 之后调用，其他数据库不做处理
+
+    参数:
+        app: Flask 应用，SQLITE_PRAGMAS 配置在每次建立连接时读取
+    """
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in app.config['SQLITE_PRAGMAS'].items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
@@ -0,0 +1,281 @@
+import os
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from flask import current_app, request, send_file
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.utils import send_file as werkzeug_send_file
+
+from metrics import record_io
+
+# URL 中带有内容版本时内容不会再变，浏览器可以缓存一年
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# 文件发送方式: direct 由应用读取文件，x-accel 交给 nginx，x-sendfile 交给 Apache/lighttpd
+FILE_DELIVERY_MODES = ('direct', 'x-accel', 'x-sendfile')
+
+# 一次请求最多的区间数，超过时忽略 Range 返回完整文件（200），避免大量小区间拖慢响应
+MAX_RANGES = 16
+CHUNK_SIZE = 64 * 1024
+
+
+def content_version(image):
+    """
+    获取图片内容版本，用作 URL 中的 v 参数
+
+    参数:
+        image: Image 记录
+    返回:
+        内容哈希前 16 位，没有哈希时返回 None
+    """
+    return image.file_hash[:16] if image.file_hash else None
+
+
+def _set_cache_control(response, immutable):
+    # 图片需要登录才能访问，只允许浏览器缓存，不允许共享缓存
+    response.cache_control.private = True
+    response.cache_control.public = None
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        # 每次使用前用 ETag 验证，内容未变时只返回 304
+        response.cache_control.no_cache = True
+        response.cache_control.max_age = None
+    response.expires = None
+
+
+def not_modified_response(etag, version):
+    """
+    请求的 If-None-Match 与 ETag 相同时直接返回 304，不需要打开文件
+
+    参数:
+        etag: 强 ETag，通常由内容哈希得到
+        version: 当前内容版本
+    返回:
+        304 响应，需要返回完整内容时返回 None
+    """
+    if not etag or not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    _set_cache_control(response, is_versioned_request(version))
+    return response
+
+
+def is_versioned_request(version):
+    """URL 中的 v 参数与当前内容版本一致时，这个 URL 的内容不会再变"""
+    return version is not None and request.args.get('v') == version
+
+
+def _accel_redirect_uri(path):
+    """
+    将文件路径转换为 nginx internal location 下的 URI
+
+    参数:
+        path: 相对应用根目录的文件路径
+    返回:
+        X-Accel-Redirect 使用的 URI，文件不在应用目录下时返回 None
+    """
+    relative = os.path.relpath(os.path.join(current_app.root_path, path), current_app.root_path)
+    if relative.startswith('..'):
+        return None
+    prefix = current_app.config['X_ACCEL_PREFIX'].rstrip('/')
+    return f"{prefix}/{quote(relative.replace(os.sep, '/'))}"
+
+
+def _send_offloaded_file(path, etag, mimetype, download_name, mode):
+    """
+    只返回响应头，文件内容由前端代理发送，Range 请求也由代理处理
+    """
+    # Flask 的 send_file 只读取全局的 USE_X_SENDFILE 配置，这里直接调用 werkzeug
+    response = werkzeug_send_file(
+        path,
+        request.environ,
+        mimetype=mimetype,
+        download_name=download_name,
+        etag=etag or True,
+        conditional=False,
+        use_x_sendfile=True,
+        response_class=current_app.response_class,
+        _root_path=current_app.root_path
+    )
+    if mode == 'x-accel':
+        sendfile_path = response.headers.pop('X-Sendfile')
+        response.headers['X-Accel-Redirect'] = _accel_redirect_uri(sendfile_path)
+    return response
+
+
+def _if_range_matches(etag, mtime):
+    """
+    检查 If-Range，资源已变化时应返回完整文件
+
+    参数:
+        etag: 当前强 ETag
+        mtime: 文件修改时间戳
+    返回:
+        可以按 Range 返回部分内容时返回 True
+    """
+    if_range = request.if_range
+    if if_range.etag is not None:
+        # If-Range 只能使用强比较
+        return etag is not None and if_range.etag == etag
+    if if_range.date is not None:
+        return if_range.date == datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+    return True
+
+
+def _satisfiable_ranges(ranges, size):
+    """
+    将请求的区间转换为文件内的 [start, end) 区间，并合并相邻或重叠的区间
+
+    参数:
+        ranges: werkzeug 解析出的 (start, stop) 列表
+        size: 文件大小
+    返回:
+        排序并合并后的区间列表
+    """
+    result = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(size + start, 0), size
+        else:
+            stop = size if stop is None else min(stop, size)
+        if start < stop:
+            result.append((start, stop))
+
+    result.sort()
+    merged = []
+    for start, stop in result:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _send_ranges(path, etag, mimetype, ranges, size, mtime):
+    """
+    返回 206 部分内容，多个区间时使用 multipart/byteranges，边读边发送
+    """
+    if len(ranges) == 1:
+        boundary = None
+        heads = [b'']
+        separator = tail = b''
+    else:
+        boundary = uuid.uuid4().hex
+        part_type = mimetype or 'application/octet-stream'
+        heads = [
+            (
+                f"--{boundary}\r\n"
+                f"Content-Type: {part_type}\r\n"
+                f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n"
+            ).encode('ascii')
+            for start, stop in ranges
+        ]
+        separator = b'\r\n'
+        tail = f"--{boundary}--\r\n".encode('ascii')
+    length = sum(
+        len(head) + (stop - start) + len(separator)
+        for head, (start, stop) in zip(heads, ranges)
+    ) + len(tail)
+
+    def generate():
+        with open(path, 'rb') as f:
+            for head, (start, stop) in zip(heads, ranges):
+                yield head
+                f.seek(start)
+                remaining = stop - start
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+                yield separator
+        yield tail
+
+    response = current_app.response_class(
+        generate(),
+        status=206,
+        mimetype=mimetype if boundary is None else f'multipart/byteranges; boundary={boundary}',
+        direct_passthrough=True
+    )
+    if boundary is None:
+        response.headers['Content-Range'] = f"bytes {ranges[0][0]}-{ranges[0][1] - 1}/{size}"
+    response.content_length = length
+    response.accept_ranges = 'bytes'
+    response.last_modified = mtime
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+def _send_range_aware_file(path, etag, mimetype, download_name):
+    """
+    由应用直接发送文件。单个区间和 If-Range 由 send_file 处理，
+    werkzeug 不支持多区间，这里单独返回 multipart/byteranges
+    """
+    byte_range = request.range
+    if byte_range is not None and byte_range.units == 'bytes' and len(byte_range.ranges) > MAX_RANGES:
+        # send_file 对多区间请求返回 416，区间过多时不处理条件请求，直接返回完整文件
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            download_name=download_name,
+            etag=etag or True,
+            conditional=False
+        )
+        response.accept_ranges = 'bytes'
+        return response
+
+    if byte_range is not None and byte_range.units == 'bytes' and len(byte_range.ranges) > 1:
+        full_path = os.path.join(current_app.root_path, path)
+        stat = os.stat(full_path)
+        if _if_range_matches(etag, stat.st_mtime):
+            ranges = _satisfiable_ranges(byte_range.ranges, stat.st_size)
+            if not ranges:
+                raise RequestedRangeNotSatisfiable(length=stat.st_size)
+            # 合并后可能只剩一个区间，此时不使用 multipart
+            return _send_ranges(full_path, etag, mimetype, ranges, stat.st_size, stat.st_mtime)
+
+    return send_file(
+        path,
+        mimetype=mimetype,
+        download_name=download_name,
+        etag=etag or True,
+        conditional=True
+    )
+
+
+def send_cached_file(path, etag, version, mimetype=None, download_name=None):
+    """
+    发送文件并设置缓存相关的响应头，支持条件请求
+
+    参数:
+        path: 文件路径
+        etag: 强 ETag，为空时由文件修改时间和大小生成
+        version: 当前内容版本
+        mimetype: 文件类型
+        download_name: 下载时的文件名
+    返回:
+        响应对象
+    """
+    response = not_modified_response(etag, version)
+    if response is not None:
+        return response
+
+    mode = current_app.config['FILE_DELIVERY']
+    if mode == 'x-accel' and _accel_redirect_uri(path) is None:
+        mode = 'direct'
+
+    if mode == 'direct':
+        response = _send_range_aware_file(path, etag, mimetype, download_name)
+        record_io('read', response.content_length)
+    else:
+        response = _send_offloaded_file(path, etag, mimetype, download_name, mode)
+    _set_cache_control(response, etag is not None and is_versioned_request(version))
+    return response
@@ -5,4 +5,7 @@ docker-compose -f docker-compose.prod.yml pull
 
 # 重启服务
 docker-compose -f docker-compose.prod.yml down
+
+# 升级数据库结构
+docker-compose -f docker-compose.prod.yml run --rm web flask db upgrade
 docker-compose -f docker-compose.prod.yml up -d 
\ No newline at end of file
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+
+from exif_utils import get_exif_data
+from models import db, Image, ImageExif
+from storage import get_image_path
+
+# 支持的导出格式
+EXPORT_FORMATS = ('jsonl', 'csv')
+
+EXPORT_MIMETYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# 每次查询的图片数，导出时内存占用只与批大小有关
+EXPORT_BATCH_SIZE = 500
+
+# 合并成较大的块再发送，避免每行一次写入
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# CSV 中每张图片固定的列
+CSV_BASE_COLUMNS = ('id', 'filename', 'original_filename', 'upload_date', 'file_hash')
+
+
+def iter_folder_exif(folder_id, batch_size=EXPORT_BATCH_SIZE):
+    """
+    按图片ID顺序逐批读取文件夹中图片的EXIF信息
+
+    只查询需要的列，不加载 ORM 对象；有索引时使用索引，
+    没有索引的图片直接读取文件头（不写入索引）
+
+    参数:
+        folder_id: 文件夹ID
+        batch_size: 每批查询的图片数
+    返回:
+        生成器，每张图片一个字典
+    """
+    query = db.session.query(
+        Image.id, Image.filename, Image.original_filename, Image.upload_date, Image.file_hash,
+        Image.user_id, Image.folder_id, Image.blob_hash, ImageExif.exif_data
+    ).outerjoin(ImageExif, ImageExif.image_id == Image.id).filter(Image.folder_id == folder_id)
+
+    last_id = 0
+    while True:
+        rows = query.filter(Image.id > last_id).order_by(Image.id).limit(batch_size).all()
+        if not rows:
+            return
+        for row in rows:
+            exif_data = row.exif_data
+            if exif_data is None:
+                # 转换成与索引相同的 JSON 形式
+                exif_data = json.loads(json.dumps(get_exif_data(get_image_path(row))[0], default=str))
+            yield {
+                'id': row.id,
+                'filename': row.filename,
+                'original_filename': row.original_filename,
+                'upload_date': row.upload_date.isoformat() if row.upload_date else None,
+                'file_hash': row.file_hash,
+                'exif': exif_data,
+            }
+        last_id = rows[-1].id
+
+
+def _buffered(lines, chunk_size=STREAM_CHUNK_SIZE):
+    """将逐行生成的文本合并成块"""
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+    if chunk:
+        yield ''.join(chunk)
+
+
+def generate_jsonl(records):
+    """每条记录输出一行 JSON"""
+    return _buffered(json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in records)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def generate_csv(records, tags=None):
+    """
+    每条记录输出一行 CSV
+
+    参数:
+        records: iter_folder_exif 返回的记录
+        tags: 作为单独列输出的标签名列表，为空时所有EXIF信息以 JSON 放在 exif 列中
+    返回:
+        生成器，返回 CSV 文本块
+    """
+    return _buffered(_iter_csv_lines(records, tags))
+
+
+def _iter_csv_lines(records, tags):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    # 带 BOM，Excel 打开时能正确识别 UTF-8
+    writer.writerow(CSV_BASE_COLUMNS + (tuple(tags) if tags else ('exif',)))
+    yield '\ufeff' + flush()
+
+    for record in records:
+        row = [record[column] for column in CSV_BASE_COLUMNS]
+        if tags:
+            row += [_csv_value(record['exif'].get(tag)) for tag in tags]
+        else:
+            row.append(_csv_value(record['exif']))
+        writer.writerow(row)
+        yield flush()
@@ -0,0 +1,152 @@
+import json
+import os
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from exif_utils import get_exif_data
+from models import db, Image, ImageExif
+from storage import get_image_path
+
+exif_cli = AppGroup('exif', help='EXIF索引管理')
+
+
+def _restore_tuples(value):
+    """JSON 把元组存成了列表，读取时还原，保持与 get_exif_data 返回值一致"""
+    if isinstance(value, list):
+        return tuple(_restore_tuples(v) for v in value)
+    return value
+
+
+def _normalize(exif_data):
+    """转换成 JSON 往返后的形式，用于比较文件与索引"""
+    return json.loads(json.dumps(exif_data))
+
+
+def index_image_exif(image, file_path=None):
+    """
+    解析图片的EXIF信息并写入索引，不提交事务
+
+    参数:
+        image: Image 记录
+        file_path: 图片路径，默认根据记录计算
+    返回:
+        (exif_data, tag_ids)，与 get_exif_data 相同
+    """
+    exif_data, tag_ids = get_exif_data(file_path or get_image_path(image))
+
+    if image.exif is None:
+        image.exif = ImageExif()
+    image.exif.exif_data = exif_data
+    image.exif.tag_ids = tag_ids
+    image.exif.indexed_at = datetime.utcnow()
+
+    return exif_data, tag_ids
+
+
+def get_indexed_exif(image):
+    """
+    从索引中读取EXIF信息，没有索引时解析文件并写入索引（需要调用方提交）
+
+    参数:
+        image: Image 记录
+    返回:
+        (exif_data, tag_ids)，与 get_exif_data 相同
+    """
+    if image.exif is None:
+        return index_image_exif(image)
+
+    exif_data = {k: _restore_tuples(v) for k, v in image.exif.exif_data.items()}
+    return exif_data, dict(image.exif.tag_ids)
+
+
+def find_index_drift(image):
+    """
+    比较文件中的EXIF与索引是否一致
+
+    参数:
+        image: Image 记录
+    返回:
+        不一致的原因，一致时返回 None
+    """
+    file_path = get_image_path(image)
+    if not os.path.exists(file_path):
+        return '文件不存在'
+    if image.exif is None:
+        return '缺少索引'
+
+    exif_data, tag_ids = get_exif_data(file_path)
+    if _normalize(exif_data) != image.exif.exif_data:
+        changed = set(exif_data) ^ set(image.exif.exif_data)
+        changed |= {k for k in exif_data if k in image.exif.exif_data
+                    and _normalize(exif_data[k]) != image.exif.exif_data[k]}
+        return f"标签不一致: {', '.join(sorted(changed))}"
+    if tag_ids != image.exif.tag_ids:
+        return '标签ID不一致'
+    return None
+
+
+def _iter_image_batches(query, batch_size):
+    """按ID分批读取图片，每批处理后提交也不会重复或遗漏"""
+    last_id = 0
+    while True:
+        batch = query.filter(Image.id > last_id).order_by(Image.id).limit(batch_size).all()
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1].id
+
+
+@exif_cli.command('backfill')
+@click.option('--force', is_flag=True, help='重新索引已有索引的图片')
+@click.option('--batch-size', default=200, show_default=True, help='每批提交的图片数')
+def backfill_command(force, batch_size):
+    """为 uploads 目录中已有的图片建立EXIF索引"""
+    query = Image.query
+    if not force:
+        query = query.outerjoin(ImageExif).filter(ImageExif.image_id.is_(None))
+
+    count = 0
+    missing = 0
+    for batch in _iter_image_batches(query, batch_size):
+        for image in batch:
+            file_path = get_image_path(image)
+            if not os.path.exists(file_path):
+                missing += 1
+                click.echo(f"文件不存在，跳过: {file_path}")
+                continue
+            index_image_exif(image, file_path)
+            count += 1
+        db.session.commit()
+        click.echo(f"已索引 {count} 张图片")
+
+    click.echo(f"完成: 索引 {count} 张，缺少文件 {missing} 张")
+
+
+@exif_cli.command('check')
+@click.option('--fix', is_flag=True, help='重新索引不一致的图片')
+@click.option('--batch-size', default=200, show_default=True, help='每批检查的图片数')
+def check_command(fix, batch_size):
+    """检查EXIF索引与文件是否一致"""
+    drifted = 0
+    checked = 0
+    for batch in _iter_image_batches(Image.query, batch_size):
+        for image in batch:
+            checked += 1
+            reason = find_index_drift(image)
+            if reason is None:
+                continue
+            drifted += 1
+            click.echo(f"图片 {image.id} ({image.filename}): {reason}")
+            if fix and reason != '文件不存在':
+                index_image_exif(image)
+        if fix:
+            db.session.commit()
+        else:
+            # 只读检查，释放已加载的记录
+            db.session.expunge_all()
+
+    click.echo(f"检查 {checked} 张图片，{drifted} 张不一致")
+    if drifted and not fix:
+        raise SystemExit(1)
@@ -1,13 +1,251 @@
 from PIL import Image
 from PIL.ExifTags import TAGS
 import json
+import logging
+import mmap
 import os
 import piexif
 import base64
+import shutil
+import struct
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# EXIF 数据段（APP1）的标识头
+EXIF_HEADER = b'Exif\x00\x00'
+
+# JPEG 段长度字段为 2 字节且包含自身，数据最多 65533 字节
+MAX_APP1_PAYLOAD = 0xFFFF - 2
+
+# 没有长度字段的 JPEG 标记（SOI、EOI、RSTn、TEM）
+_STANDALONE_MARKERS = {0xD8, 0xD9, 0x01} | set(range(0xD0, 0xD8))
+
+# piexif 中的 IFD 名称
+EXIF_IFD_NAMES = ('0th', 'Exif', 'GPS', 'Interop', '1st')
+
+# 保存自定义标签名称映射的标签，值为 JSON: {"标签ID": "标签名"}
+CUSTOM_TAG_NAMES_TAG = 64999
+
+# 自定义标签ID从这里开始分配
+CUSTOM_TAG_ID_START = 65000
+
+
+def _reverse_mapping(mapping):
+    """反转 {ID: 名称}，同名时保留第一个，与按顺序线性查找的结果一致"""
+    reverse = {}
+    for tag_id, name in mapping.items():
+        reverse.setdefault(name, tag_id)
+    return reverse
+
+
+# 标签注册表，模块加载时构建一次，读写EXIF时直接查表
+# {IFD: {标签ID: 标签名}}
+TAG_NAMES = {
+    ifd: {tag_id: info['name'] for tag_id, info in piexif.TAGS[ifd].items()}
+    for ifd in EXIF_IFD_NAMES
+}
+# {IFD: {标签名: 标签ID}}
+TAG_IDS = {ifd: _reverse_mapping(names) for ifd, names in TAG_NAMES.items()}
+# {IFD: {标签ID: "IFD.十六进制ID"}}，与 delete_exif_tag 使用的格式相同
+TAG_KEYS = {
+    ifd: {tag_id: f"{ifd}.{hex(tag_id)}" for tag_id in names}
+    for ifd, names in TAG_NAMES.items()
+}
+# Pillow 使用不分 IFD 的标签空间，modify_exif_info 按名称写入时使用
+PIL_TAG_IDS = _reverse_mapping(TAGS)
+
+
+def load_custom_tag_names(value):
+    """
+    解析 64999 标签中保存的自定义标签名称
+
+    参数:
+        value: 标签值（JSON 字符串或 bytes）
+    返回:
+        {标签ID: 标签名}，解析失败时返回空字典
+    """
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', errors='replace').strip('\x00')
+    try:
+        return {int(tag_id): name for tag_id, name in json.loads(value).items()}
+    except (TypeError, ValueError, AttributeError):
+        return {}
+
+
+def lookup_tag_id(tag_name, custom_tag_ids=None):
+    """
+    按名称查找可写入的标签ID，先查标准标签，再查图片中已有的自定义标签
+
+    参数:
+        tag_name: 标签名
+        custom_tag_ids: {自定义标签名: 标签ID}
+    返回:
+        标签ID，找不到时返回 None
+    """
+    tag_id = PIL_TAG_IDS.get(tag_name)
+    if tag_id is None and custom_tag_ids:
+        tag_id = custom_tag_ids.get(tag_name)
+    return tag_id
+
+def read_exif_bytes(f):
+    """
+    直接扫描文件头读取原始EXIF数据，不经过 Pillow，也不读取图像数据
+
+    JPEG 逐段读取标记，跳过其他段，遇到 EXIF 段或图像数据（SOS）即停止；
+    TIFF 的 IFD 可能位于文件任意位置，使用 mmap 只读取实际访问到的部分
+
+    参数:
+        f: 以二进制模式打开的文件对象
+    返回:
+        以 TIFF 头开始的EXIF数据（bytes，TIFF 文件为 mmap），没有EXIF时返回 None
+    异常:
+        ValueError: 不是 JPEG 或 TIFF 文件
+    """
+    head = f.read(2)
+    if head in (b'II', b'MM'):
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if head != b'\xff\xd8':
+        raise ValueError('不是 JPEG 或 TIFF 文件')
+
+    while True:
+        byte = f.read(1)
+        if byte != b'\xff':
+            return None
+        # 标记前可以有任意个填充的 0xFF
+        marker = 0xFF
+        while marker == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                return None
+            marker = byte[0]
+
+        # EXIF 段必须在图像数据之前
+        if marker in (0xD9, 0xDA):
+            return None
+        if marker in _STANDALONE_MARKERS:
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            return None
+
+        if marker == 0xE1:
+            data = f.read(length - 2)
+            if data.startswith(EXIF_HEADER):
+                return data[len(EXIF_HEADER):]
+        else:
+            f.seek(length - 2, os.SEEK_CUR)
+
+
+def read_custom_tags(tiff_data):
+    """
+    读取 0th IFD 中 modify_exif_info 写入的自定义标签，piexif.load 会丢弃未知标签
+
+    IFD 中的标签按ID排序，自定义标签ID最大，从后往前读取，遇到标准标签即停止
+
+    参数:
+        tiff_data: 以 TIFF 头开始的EXIF数据
+    返回:
+        {标签ID: 值(bytes)}
+    """
+    result = {}
+    try:
+        endian = '<' if tiff_data[:2] == b'II' else '>'
+        offset = struct.unpack(endian + 'L', tiff_data[4:8])[0]
+        count = struct.unpack(endian + 'H', tiff_data[offset:offset + 2])[0]
+        for i in reversed(range(count)):
+            entry = offset + 2 + 12 * i
+            tag_id, value_type, value_count = struct.unpack(endian + 'HHL', tiff_data[entry:entry + 8])
+            if tag_id < CUSTOM_TAG_NAMES_TAG:
+                break
+            # 自定义标签的值为字符串（ASCII）或字节（UNDEFINED）
+            if value_type not in (2, 7):
+                continue
+            if value_count <= 4:
+                value = tiff_data[entry + 8:entry + 8 + value_count]
+            else:
+                value_offset = struct.unpack(endian + 'L', tiff_data[entry + 8:entry + 12])[0]
+                value = tiff_data[value_offset:value_offset + value_count]
+            result[tag_id] = bytes(value)
+    except struct.error:
+        logger.debug("读取自定义标签时出错")
+    return result
+
+
+def _decode_exif_value(value):
+    if isinstance(value, bytes):
+        try:
+            return value.decode('utf-8').strip('\x00')
+        except UnicodeDecodeError:
+            return f"二进制数据 ({len(value)} 字节)"
+    return value
+
+
+def parse_exif_dict(exif_dict):
+    """
+    将 piexif 的EXIF字典转换为标签名到值的字典
+
+    参数:
+        exif_dict: piexif.load 返回的字典
+    返回:
+        包含EXIF信息的字典，以及标签ID映射
+    """
+    parsed_exif = {}
+    tag_ids = {}
+    
+    # 处理0th IFD，包括 modify_exif_info 写入的自定义标签
+    ifd = exif_dict.get('0th', {})
+    names = TAG_NAMES['0th']
+    keys = TAG_KEYS['0th']
+    custom_names = load_custom_tag_names(ifd[CUSTOM_TAG_NAMES_TAG]) if CUSTOM_TAG_NAMES_TAG in ifd else {}
+    for tag_id, value in ifd.items():
+        tag_name = names.get(tag_id) or custom_names.get(tag_id)
+        if tag_name:
+            parsed_exif[tag_name] = _decode_exif_value(value)
+            tag_ids[tag_name] = keys.get(tag_id) or f"0th.{hex(tag_id)}"
+    
+    # 处理Exif IFD
+    names = TAG_NAMES['Exif']
+    keys = TAG_KEYS['Exif']
+    for tag_id, value in exif_dict.get('Exif', {}).items():
+        tag_name = names.get(tag_id)
+        if tag_name:
+            # 特殊处理UserComment标签
+            if tag_id == piexif.ExifIFD.UserComment:
+                try:
+                    # 跳过前8个字节（字符集标识符）
+                    if len(value) > 8:
+                        comment_value = value[8:].decode('utf-8', errors='replace')
+                        parsed_exif['UserComment'] = comment_value
+                    else:
+                        parsed_exif['UserComment'] = value.decode('utf-8', errors='replace')
+                    tag_ids['UserComment'] = keys[tag_id]
+                    continue
+                except Exception as e:
+                    logger.warning("解析UserComment时出错: %s", e)
+                    # 如果解析失败，按普通方式处理
+            
+            parsed_exif[tag_name] = _decode_exif_value(value)
+            tag_ids[tag_name] = keys[tag_id]
+    
+    # 处理GPS IFD
+    names = TAG_NAMES['GPS']
+    keys = TAG_KEYS['GPS']
+    for tag_id, value in exif_dict.get('GPS', {}).items():
+        tag_name = names.get(tag_id)
+        if tag_name:
+            parsed_exif[tag_name] = _decode_exif_value(value)
+            tag_ids[tag_name] = keys[tag_id]
+    
+    return parsed_exif, tag_ids
 
 def get_exif_data(image_path):
     """
-    获取图片的EXIF信息
+    获取图片的EXIF信息，只读取文件头，不解码图像
     
     参数:
         image_path: 图片文件路径
@@ -15,82 +253,135 @@ def get_exif_data(image_path):
         包含EXIF信息的字典，以及标签ID映射
     """
     try:
-        # 打开图片
-        img = Image.open(image_path)
-        
-        # 检查图片格式
-        if img.format not in ['JPEG', 'TIFF']:
-            print(f"图片格式 {img.format} 不支持EXIF数据")
-            return {}, {}
-        
-        # 读取EXIF数据
-        exif_data = img.info.get('exif', b'')
-        if not exif_data:
-            return {}, {}
-        
-        exif_dict = piexif.load(exif_data)
-        
-        # 解析EXIF数据
-        parsed_exif = {}
-        tag_ids = {}
-        
-        # 处理0th IFD
-        for tag_id, value in exif_dict.get('0th', {}).items():
-            if tag_id in piexif.TAGS['0th']:
-                tag_name = piexif.TAGS['0th'][tag_id]['name']
-                if isinstance(value, bytes):
-                    try:
-                        value = value.decode('utf-8').strip('\x00')
-                    except UnicodeDecodeError:
-                        value = f"二进制数据 ({len(value)} 字节)"
-                parsed_exif[tag_name] = value
-                tag_ids[tag_name] = f"0th.{hex(tag_id)}"
-        
-        # 处理Exif IFD
-        for tag_id, value in exif_dict.get('Exif', {}).items():
-            if tag_id in piexif.TAGS['Exif']:
-                tag_name = piexif.TAGS['Exif'][tag_id]['name']
-                
-                # 特殊处理UserComment标签
-                if tag_id == piexif.ExifIFD.UserComment:
-                    try:
-                        # 跳过前8个字节（字符集标识符）
-                        if len(value) > 8:
-                            comment_value = value[8:].decode('utf-8', errors='replace')
-                            parsed_exif['UserComment'] = comment_value
-                        else:
-                            parsed_exif['UserComment'] = value.decode('utf-8', errors='replace')
-                        tag_ids['UserComment'] = f"Exif.{hex(tag_id)}"
-                        continue
-                    except Exception as e:
-                        print(f"解析UserComment时出错: {str(e)}")
-                        # 如果解析失败，按普通方式处理
-                
-                if isinstance(value, bytes):
-                    try:
-                        value = value.decode('utf-8').strip('\x00')
-                    except UnicodeDecodeError:
-                        value = f"二进制数据 ({len(value)} 字节)"
-                parsed_exif[tag_name] = value
-                tag_ids[tag_name] = f"Exif.{hex(tag_id)}"
-        
-        # 处理GPS IFD
-        for tag_id, value in exif_dict.get('GPS', {}).items():
-            if tag_id in piexif.TAGS['GPS']:
-                tag_name = piexif.TAGS['GPS'][tag_id]['name']
-                if isinstance(value, bytes):
-                    try:
-                        value = value.decode('utf-8').strip('\x00')
-                    except UnicodeDecodeError:
-                        value = f"二进制数据 ({len(value)} 字节)"
-                parsed_exif[tag_name] = value
-                tag_ids[tag_name] = f"GPS.{hex(tag_id)}"
+        with open(image_path, 'rb') as f:
+            try:
+                exif_data = read_exif_bytes(f)
+            except ValueError:
+                logger.debug("图片 %s 的格式不支持EXIF数据", image_path)
+                return {}, {}
+            if not exif_data:
+                return {}, {}
+            try:
+                exif_dict = piexif.load(exif_data)
+                exif_dict['0th'].update(read_custom_tags(exif_data))
+            finally:
+                if isinstance(exif_data, mmap.mmap):
+                    exif_data.close()
         
-        return parsed_exif, tag_ids
+        return parse_exif_dict(exif_dict)
     except Exception as e:
-        print(f"读取图片 {image_path} 时出错: {str(e)}")
+        logger.warning("读取图片 %s 时出错: %s", image_path, e)
         return {}, {}
 
+def _read_jpeg_header_segments(f):
+    """
+    读取 JPEG 文件从 SOI 到 SOS 之前的所有段，不读取图像数据
+
+    参数:
+        f: 以二进制模式打开的文件对象，位置在文件开头
+    返回:
+        段列表 [(标记, 段数据)]，文件对象停在 SOS 标记处
+    """
+    if f.read(2) != b'\xff\xd8':
+        raise ValueError("不是有效的JPEG文件")
+
+    segments = []
+    while True:
+        start = f.tell()
+        byte = f.read(1)
+        if not byte:
+            raise ValueError("JPEG文件在图像数据之前结束")
+        if byte != b'\xff':
+            raise ValueError(f"无效的JPEG标记，偏移量 {start}")
+
+        # 标记前可以有任意个填充字节 0xFF
+        marker = f.read(1)
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            raise ValueError("JPEG文件在图像数据之前结束")
+        marker = marker[0]
+
+        # 遇到 SOS 或 EOI 后面就是图像数据，回退到标记处停止
+        if marker in (0xDA, 0xD9):
+            f.seek(start)
+            return segments
+
+        if marker in _STANDALONE_MARKERS:
+            segments.append((marker, b''))
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            raise ValueError("JPEG段长度不完整")
+        length = struct.unpack('>H', length_bytes)[0]
+        data = f.read(length - 2)
+        if len(data) != length - 2:
+            raise ValueError("JPEG段数据不完整")
+        segments.append((marker, data))
+
+
+def write_exif(image_path, exif_bytes, output_path=None):
+    """
+    将EXIF数据写入图片，JPEG 直接替换 APP1 段，不重新编码像素数据
+
+    参数:
+        image_path: 图片路径
+        exif_bytes: piexif.dump 或 Image.Exif.tobytes 生成的EXIF数据
+        output_path: 输出路径，默认覆盖原文件
+    """
+    output_path = output_path or image_path
+    if exif_bytes and not exif_bytes.startswith(EXIF_HEADER):
+        exif_bytes = EXIF_HEADER + exif_bytes
+
+    # 先写临时文件再替换，写入失败时原文件不受影响
+    base_name, ext = os.path.splitext(output_path)
+    temp_path = f"{base_name}_{uuid.uuid4().hex}_temp{ext}"
+
+    with open(image_path, 'rb') as f:
+        is_jpeg = f.read(2) == b'\xff\xd8'
+
+    try:
+        if not is_jpeg:
+            # 非 JPEG 格式（如 TIFF）只能通过 Pillow 重新保存
+            with Image.open(image_path) as img:
+                img.save(temp_path, format=img.format, exif=exif_bytes)
+            os.replace(temp_path, output_path)
+            return
+
+        with open(image_path, 'rb') as src:
+            segments = _read_jpeg_header_segments(src)
+
+            # 移除原有的EXIF段，保留其他段（JFIF、ICC、XMP、量化表等）
+            segments = [
+                (marker, data) for marker, data in segments
+                if not (marker == 0xE1 and data.startswith(EXIF_HEADER))
+            ]
+
+            # 新的EXIF段放在 APP0(JFIF) 之后，否则紧跟 SOI
+            insert_at = 1 if segments and segments[0][0] == 0xE0 else 0
+            if exif_bytes:
+                if len(exif_bytes) > MAX_APP1_PAYLOAD:
+                    raise ValueError(f"EXIF数据过大 ({len(exif_bytes)} 字节)")
+                segments.insert(insert_at, (0xE1, exif_bytes))
+
+            with open(temp_path, 'wb') as dst:
+                dst.write(b'\xff\xd8')
+                for marker, data in segments:
+                    dst.write(bytes((0xFF, marker)))
+                    if marker not in _STANDALONE_MARKERS:
+                        dst.write(struct.pack('>H', len(data) + 2))
+                        dst.write(data)
+                # 图像数据原样复制
+                shutil.copyfileobj(src, dst)
+
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
 def get_unused_tag_id(existing_ids):
     """
     获取一个未使用的标签ID
@@ -100,11 +391,8 @@ def get_unused_tag_id(existing_ids):
     返回:
         一个未使用的标签ID
     """
-    # 从65000开始分配自定义标签ID
-    custom_id_start = 65000
-    
     # 找到一个未使用的ID
-    new_id = custom_id_start
+    new_id = CUSTOM_TAG_ID_START
     while new_id in existing_ids:
         new_id += 1
     
@@ -128,16 +416,13 @@ def modify_exif_info(image_path, custom_data=None, tags_to_delete=None):
         # 获取当前所有标签ID
         existing_ids = set(new_exif.keys())
         
-        # 获取标签名称到ID的映射
-        exif_data, tag_ids = get_exif_data(image_path)
-        
         # 获取自定义标签ID到名称的映射
         custom_tag_names = {}
-        if 64999 in new_exif:
-            try:
-                custom_tag_names = json.loads(new_exif[64999])
-            except Exception:
-                pass
+        if CUSTOM_TAG_NAMES_TAG in new_exif:
+            custom_tag_names = {
+                str(tag_id): name
+                for tag_id, name in load_custom_tag_names(new_exif[CUSTOM_TAG_NAMES_TAG]).items()
+            }
         
         # 删除指定的标签
         if tags_to_delete:
@@ -154,59 +439,43 @@ def modify_exif_info(image_path, custom_data=None, tags_to_delete=None):
                             tag_name = TAGS.get(tag_id, f"Unknown-{tag_id}")
                         
                         del new_exif[tag_id]
-                        print(f"已删除标签: {tag_name} (ID: {tag_id})")
+                        logger.info("已删除标签: %s (ID: %s)", tag_name, tag_id)
                     else:
-                        print(f"未找到标签ID: {tag_id}")
+                        logger.warning("未找到标签ID: %s", tag_id)
                 except ValueError:
-                    print(f"无效的标签ID: {tag_id}，请输入数字ID")
+                    logger.warning("无效的标签ID: %s，请输入数字ID", tag_id)
         
         # 添加新的信息
         if custom_data:
+            custom_tag_ids = {name: int(tag_id) for tag_id, name in custom_tag_names.items()}
             for tag_name, value in custom_data.items():
-                # 检查是否是标准EXIF标签
-                standard_tag_id = None
-                for k, v in TAGS.items():
-                    if v == tag_name:
-                        standard_tag_id = k
-                        break
-                
-                # 如果是标准标签
-                if standard_tag_id:
-                    tag_id = standard_tag_id
-                # 如果是已存在的自定义标签
-                elif tag_name in tag_ids:
-                    tag_id = tag_ids[tag_name]
+                # 标准标签或已存在的自定义标签
+                tag_id = lookup_tag_id(tag_name, custom_tag_ids)
                 # 如果是新的自定义标签
-                else:
+                if tag_id is None:
                     tag_id = get_unused_tag_id(existing_ids)
                     existing_ids.add(tag_id)
                     # 保存自定义标签名称
                     custom_tag_names[str(tag_id)] = tag_name
+                    custom_tag_ids[tag_name] = tag_id
                 
                 # 存储值
                 new_exif[tag_id] = value
-                print(f"已添加标签: {tag_name} (ID: {tag_id}) = {value}")
+                logger.info("已添加标签: %s (ID: %s) = %s", tag_name, tag_id, value)
         
         # 保存自定义标签名称映射
         if custom_tag_names:
-            new_exif[64999] = json.dumps(custom_tag_names)
-        elif 64999 in new_exif:
-            del new_exif[64999]
-        
-        # 保存文件
-        # 获取原文件扩展名
-        base_name, ext = os.path.splitext(image_path)
-        # 创建临时文件，保留原扩展名
-        temp_path = f"{base_name}_temp{ext}"
-        image.save(temp_path, exif=new_exif.tobytes())
+            new_exif[CUSTOM_TAG_NAMES_TAG] = json.dumps(custom_tag_names)
+        elif CUSTOM_TAG_NAMES_TAG in new_exif:
+            del new_exif[CUSTOM_TAG_NAMES_TAG]
         
         # 关闭原图像文件
         image.close()
         
-        # 替换原文件
-        os.replace(temp_path, image_path)
-        print(f"EXIF信息已成功更新并覆盖原文件: {image_path}")
+        # 替换EXIF段并覆盖原文件，不重新编码图像
+        write_exif(image_path, new_exif.tobytes())
+        logger.info("EXIF信息已成功更新并覆盖原文件: %s", image_path)
     
     except Exception as e:
-        print(f"修改EXIF信息时出错: {str(e)}")
+        logger.warning("修改EXIF信息时出错: %s", e)
         raise e 
\ No newline at end of file
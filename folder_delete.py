@@ -0,0 +1,82 @@
+from collections import Counter
+from datetime import datetime
+
+from jobs import cancel_image_jobs, enqueue, task
+from models import db, Folder, Image, ImageExif, Job, UploadSession
+from storage import (
+    get_legacy_image_path, get_upload_part_path, release_blobs, remove_files, remove_legacy_folder_dir
+)
+from thumbnails import delete_folder_thumbnails
+
+# 每批删除的图片数，每批一个事务
+DELETE_BATCH_SIZE = 500
+
+
+def schedule_folder_delete(folder):
+    """
+    标记文件夹为待删除并加入后台任务队列（不提交事务）
+
+    参数:
+        folder: Folder 记录
+    """
+    if folder.pending_delete:
+        return
+    folder.pending_delete = True
+    enqueue('delete_folder', payload={'folder_id': folder.id})
+
+
+def _delete_image_batch(job, folder_id, batch_size):
+    """
+    删除一批图片记录并释放文件，提交后再删除不再被引用的文件
+
+    返回:
+        本批删除的图片数
+    """
+    rows = db.session.query(
+        Image.id, Image.blob_hash, Image.user_id, Image.folder_id, Image.filename
+    ).filter(Image.folder_id == folder_id).order_by(Image.id).limit(batch_size).all()
+    if not rows:
+        return 0
+
+    image_ids = [row.id for row in rows]
+
+    # 批量删除不经过 ORM 级联，先处理引用图片的记录，其他工作进程正在执行的任务标记为取消
+    cancel_image_jobs(image_ids)
+    ImageExif.query.filter(ImageExif.image_id.in_(image_ids)).delete(synchronize_session=False)
+    Image.query.filter(Image.id.in_(image_ids)).delete(synchronize_session=False)
+
+    # 图片记录删除后 Blob 才没有外键引用，计数归零的可以删除
+    orphaned = release_blobs(Counter(row.blob_hash for row in rows if row.blob_hash))
+    orphaned.extend(get_legacy_image_path(row) for row in rows if not row.blob_hash)
+    # 更新领取时间，避免删除大文件夹超过 JOB_TIMEOUT 后被其他工作进程重复领取
+    Job.query.filter_by(id=job.id).update({'locked_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+
+    remove_files(orphaned)
+    return len(rows)
+
+
+@task('delete_folder')
+def delete_folder_task(job):
+    """
+    分批删除待删除文件夹中的图片、未完成的上传和文件，最后删除文件夹记录。
+    每批单独提交，中断后重新执行时从剩余的图片继续
+    """
+    folder = db.session.get(Folder, job.payload['folder_id'])
+    if folder is None:
+        return
+    user_id, folder_id = folder.user_id, folder.id
+
+    while _delete_image_batch(job, folder_id, DELETE_BATCH_SIZE):
+        pass
+
+    # 未完成的分块上传一并取消
+    upload_ids = [upload_id for (upload_id,) in
+                  db.session.query(UploadSession.id).filter_by(folder_id=folder_id)]
+    UploadSession.query.filter_by(folder_id=folder_id).delete(synchronize_session=False)
+    Folder.query.filter_by(id=folder_id).delete(synchronize_session=False)
+    db.session.commit()
+
+    remove_files([get_upload_part_path(upload_id) for upload_id in upload_ids])
+    remove_legacy_folder_dir(user_id, folder_id)
+    delete_folder_thumbnails(user_id, folder_id)
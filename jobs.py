@@ -0,0 +1,294 @@
+import os
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import or_
+
+from exif_index import index_image_exif
+from models import db, Image, Job
+from storage import get_image_path
+from thumbnails import THUMBNAIL_SIZES, get_or_create_thumbnail
+
+jobs_cli = AppGroup('jobs', help='后台任务管理')
+
+# 任务名称到处理函数的映射，处理函数接收 Job 对象，出错时抛出异常
+TASKS = {}
+
+# 新图片保存后的处理任务：建立EXIF索引、生成缩略图
+IMAGE_PROCESSING_TASKS = ('index_exif', 'thumbnails')
+
+
+def task(name):
+    """注册后台任务处理函数"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(task_name, image=None, payload=None, max_attempts=None):
+    """
+    添加后台任务，与调用方的数据库修改在同一事务中提交
+
+    参数:
+        task_name: 任务名称，必须已注册
+        image: 关联的 Image 记录，可以为空
+        payload: 任务参数
+        max_attempts: 最大尝试次数，默认使用 JOB_MAX_ATTEMPTS
+    返回:
+        Job 记录
+    """
+    if task_name not in TASKS:
+        raise ValueError(f"未知的任务: {task_name}")
+
+    job = Job(
+        task=task_name,
+        payload=payload or {},
+        max_attempts=max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow()
+    )
+    if image is not None:
+        image.jobs.append(job)
+    else:
+        db.session.add(job)
+    return job
+
+
+def enqueue_image_processing(image):
+    """上传后的处理：建立EXIF索引、生成缩略图"""
+    for task_name in IMAGE_PROCESSING_TASKS:
+        enqueue(task_name, image)
+
+
+def cancel_image_jobs(image_ids):
+    """
+    删除图片前处理关联的任务（不提交事务）：未在执行的直接删除；
+    正在执行的标记为 cancelled 并解除与图片的关联，工作进程执行完后不会再更新或重试
+
+    参数:
+        image_ids: 图片ID列表
+    """
+    # 先删除未执行的任务，期间被其他工作进程领取的任务会留到下一步标记为取消
+    Job.query.filter(Job.image_id.in_(image_ids), Job.status != 'running') \
+        .delete(synchronize_session=False)
+    Job.query.filter(Job.image_id.in_(image_ids), Job.status == 'running').update({
+        'status': 'cancelled',
+        'image_id': None,
+        'locked_at': None,
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+
+
+def claim_job():
+    """
+    领取一个到期的任务，多个工作进程同时领取时只有一个能成功
+
+    返回:
+        Job 记录，没有可执行的任务时返回 None
+    """
+    now = datetime.utcnow()
+    # 工作进程中途退出时任务会停留在 running 状态，超时后重新领取
+    stale_before = now - timedelta(seconds=current_app.config['JOB_TIMEOUT'])
+    # PostgreSQL 上锁定候选任务，跳过其他工作进程正在领取的行；SQLite 不支持 FOR UPDATE，会忽略
+    candidates = db.session.query(Job.id).filter(
+        or_(
+            (Job.status == 'pending') & (Job.run_at <= now),
+            (Job.status == 'running') & (Job.locked_at < stale_before)
+        )
+    ).order_by(Job.run_at, Job.id).limit(10).with_for_update(skip_locked=True).all()
+
+    for (job_id,) in candidates:
+        claimed = Job.query.filter(
+            Job.id == job_id,
+            or_(
+                Job.status == 'pending',
+                (Job.status == 'running') & (Job.locked_at < stale_before)
+            )
+        ).update({'status': 'running', 'locked_at': now}, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def _retry_delay(attempts):
+    """失败后的等待时间，按指数增长，最长一小时"""
+    return timedelta(seconds=min(10 * 2 ** (attempts - 1), 3600))
+
+
+def run_job(job):
+    """
+    执行任务并记录结果，失败时按退避时间重试，超过最大次数后标记为失败
+
+    参数:
+        job: 已领取的 Job 记录
+    返回:
+        成功时返回 True
+    """
+    handler = TASKS.get(job.task)
+    job_id = job.id
+    try:
+        if handler is None:
+            raise ValueError(f"未知的任务: {job.task}")
+        handler(job)
+    except Exception as e:
+        # 丢弃任务中未提交的修改，再记录失败
+        db.session.rollback()
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        job = db.session.get(Job, job_id)
+        # 执行期间任务被删除或取消（如图片所在的文件夹已删除）时不再重试
+        if job is None or job.status != 'running':
+            current_app.logger.info(f"任务 {job_id} 已取消: {error}")
+            return False
+        job.attempts += 1
+        job.last_error = error
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = 'pending'
+            job.run_at = datetime.utcnow() + _retry_delay(job.attempts)
+        db.session.commit()
+        current_app.logger.warning(f"任务 {job.id} ({job.task}) 第 {job.attempts} 次执行失败: {job.last_error}")
+        return False
+
+    # 只更新仍在执行的任务，执行期间被删除或取消的任务保持原样
+    Job.query.filter_by(id=job_id, status='running').update({
+        'status': 'done',
+        'attempts': Job.attempts + 1,
+        'locked_at': None,
+        'last_error': None,
+        'finished_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return True
+
+
+def get_image_job_status(image):
+    """
+    获取图片的后台处理状态
+
+    参数:
+        image: Image 记录
+    返回:
+        (总体状态, 每个任务的状态列表)，总体状态为 done / pending / failed
+    """
+    jobs = sorted(image.jobs, key=lambda job: job.id)
+    statuses = {job.status for job in jobs}
+    if 'failed' in statuses:
+        overall = 'failed'
+    elif statuses - {'done'}:
+        overall = 'pending'
+    else:
+        overall = 'done'
+    return overall, [{
+        'id': job.id,
+        'task': job.task,
+        'status': job.status,
+        'attempts': job.attempts,
+        'last_error': job.last_error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    } for job in jobs]
+
+
+@task('index_exif')
+def index_exif_task(job):
+    """解析上传图片的EXIF并写入索引"""
+    image = db.session.get(Image, job.image_id)
+    if image is None:
+        return
+    file_path = get_image_path(image)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(file_path)
+    index_image_exif(image, file_path)
+    db.session.commit()
+
+
+@task('thumbnails')
+def thumbnails_task(job):
+    """预先生成所有尺寸的缩略图，浏览文件夹时不必等待生成"""
+    image = db.session.get(Image, job.image_id)
+    if image is None:
+        return
+    file_path = get_image_path(image)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(file_path)
+    for size in THUMBNAIL_SIZES:
+        get_or_create_thumbnail(image, file_path, size)
+
+
+@jobs_cli.command('work')
+@click.option('--once', is_flag=True, help='执行完当前所有到期任务后退出')
+@click.option('--poll-interval', type=float, default=None, help='没有任务时的等待秒数，默认使用 JOB_POLL_INTERVAL')
+def work_command(once, poll_interval):
+    """启动工作进程，循环领取并执行后台任务"""
+    poll_interval = poll_interval or current_app.config['JOB_POLL_INTERVAL']
+    click.echo(f"工作进程已启动 (pid {os.getpid()})")
+    done = 0
+    failed = 0
+    try:
+        while True:
+            job = claim_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            job_id = job.id
+            try:
+                succeeded = run_job(job)
+            except Exception:
+                # 记录失败时出错（如数据库暂时不可用）也不退出，任务超时后会被重新领取
+                db.session.rollback()
+                current_app.logger.exception(f"任务 {job_id} 执行出错")
+                succeeded = False
+            if succeeded:
+                done += 1
+            else:
+                failed += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.session.remove()
+    click.echo(f"工作进程退出: 成功 {done} 个，失败 {failed} 次")
+
+
+@jobs_cli.command('status')
+def status_command():
+    """按任务和状态统计任务数量"""
+    rows = db.session.query(Job.task, Job.status, db.func.count(Job.id)) \
+        .group_by(Job.task, Job.status).order_by(Job.task, Job.status).all()
+    if not rows:
+        click.echo("没有任务")
+    for task_name, status, count in rows:
+        click.echo(f"{task_name:16s} {status:8s} {count}")
+
+
+@jobs_cli.command('retry-failed')
+def retry_failed_command():
+    """将失败的任务重新加入队列"""
+    count = Job.query.filter_by(status='failed').update({
+        'status': 'pending',
+        'attempts': 0,
+        'run_at': datetime.utcnow(),
+        'finished_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+    click.echo(f"已重新加入 {count} 个任务")
+
+
+@jobs_cli.command('prune')
+@click.option('--days', default=7, show_default=True, help='删除早于该天数完成的任务')
+def prune_command(days):
+    """删除已完成或已取消的旧任务"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = Job.query.filter(Job.status.in_(['done', 'cancelled']), Job.finished_at < cutoff) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f"已删除 {count} 个任务")
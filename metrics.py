@@ -0,0 +1,377 @@
+import atexit
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from flask import abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from models import db
+
+try:
+    import fcntl
+except ImportError:  # Windows 上开发时只有一个进程，不需要文件锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 请求耗时直方图的分桶（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = 'web_pics'
+
+# 每个进程把新增计数合并到共享文件的最短间隔（秒）
+FLUSH_INTERVAL = 5.0
+
+# 在进程之间合并的字段
+_FIELDS = ('requests', 'duration_buckets', 'duration_sum', 'duration_count',
+           'queries', 'db_seconds', 'io_bytes', 'decode_seconds')
+
+
+class RequestStats:
+    """一个请求的开销，由 SQLAlchemy 事件和 record_io、measure_decode 累加"""
+
+    __slots__ = ('start', 'status', 'queries', 'db_seconds', 'read_bytes', 'write_bytes', 'decode_seconds')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.decode_seconds = 0.0
+
+
+class MetricsRegistry:
+    """
+    按端点累计的指标。每个进程先在内存中累计，再由 SharedMetricsFile 定期合并到共享文件，
+    /metrics 返回所有 gunicorn 工作进程的合计
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.requests = defaultdict(int)  # (endpoint, method, status) -> 次数
+        self.duration_buckets = defaultdict(lambda: [0] * len(DURATION_BUCKETS))
+        self.duration_sum = defaultdict(float)
+        self.duration_count = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.db_seconds = defaultdict(float)
+        self.io_bytes = defaultdict(int)  # (endpoint, direction) -> 字节数
+        self.decode_seconds = defaultdict(float)
+
+    def observe(self, endpoint, method, status, stats, duration):
+        with self._lock:
+            self.requests[(endpoint, method, str(status))] += 1
+            buckets = self.duration_buckets[endpoint]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    buckets[i] += 1
+            self.duration_sum[endpoint] += duration
+            self.duration_count[endpoint] += 1
+            self.queries[endpoint] += stats.queries
+            self.db_seconds[endpoint] += stats.db_seconds
+            self.io_bytes[(endpoint, 'read')] += stats.read_bytes
+            self.io_bytes[(endpoint, 'write')] += stats.write_bytes
+            self.decode_seconds[endpoint] += stats.decode_seconds
+
+    def snapshot(self, reset=False):
+        """
+        导出计数，元组键转换为列表，可以写入 JSON
+
+        参数:
+            reset: 导出后清空，用于取出上次合并之后新增的计数
+        返回:
+            {字段: [[键, 值], ...]}
+        """
+        with self._lock:
+            result = {
+                name: [[list(key) if isinstance(key, tuple) else key, value]
+                       for key, value in getattr(self, name).items()]
+                for name in _FIELDS
+            }
+            if reset:
+                self._reset()
+        return result
+
+    def merge(self, snapshot):
+        """把 snapshot() 导出的计数加到当前计数上"""
+        with self._lock:
+            for name in _FIELDS:
+                target = getattr(self, name)
+                for key, value in snapshot.get(name, []):
+                    key = tuple(key) if isinstance(key, list) else key
+                    if isinstance(value, list):
+                        target[key] = [a + b for a, b in zip(target[key], value)]
+                    else:
+                        target[key] += value
+
+    def is_empty(self):
+        with self._lock:
+            return not self.duration_count
+
+    def render(self):
+        """
+        生成 Prometheus 文本格式
+
+        返回:
+            字符串
+        """
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+            for suffix, labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+
+        with self._lock:
+            metric('http_requests_total', 'counter', '请求数', [
+                ('', {'endpoint': endpoint, 'method': method, 'status': status}, count)
+                for (endpoint, method, status), count in sorted(self.requests.items())
+            ])
+
+            samples = []
+            for endpoint in sorted(self.duration_count):
+                for bound, count in zip(DURATION_BUCKETS, self.duration_buckets[endpoint]):
+                    samples.append(('_bucket', {'endpoint': endpoint, 'le': _format_value(bound)}, count))
+                samples.append(('_bucket', {'endpoint': endpoint, 'le': '+Inf'}, self.duration_count[endpoint]))
+                samples.append(('_sum', {'endpoint': endpoint}, self.duration_sum[endpoint]))
+                samples.append(('_count', {'endpoint': endpoint}, self.duration_count[endpoint]))
+            metric('http_request_duration_seconds', 'histogram', '请求总耗时', samples)
+
+            metric('db_queries_total', 'counter', '执行的 SQL 语句数', [
+                ('', {'endpoint': endpoint}, count) for endpoint, count in sorted(self.queries.items())
+            ])
+            metric('db_query_seconds_total', 'counter', '执行 SQL 的时间', [
+                ('', {'endpoint': endpoint}, seconds) for endpoint, seconds in sorted(self.db_seconds.items())
+            ])
+            metric('file_io_bytes_total', 'counter', '读写图片文件的字节数', [
+                ('', {'endpoint': endpoint, 'direction': direction}, count)
+                for (endpoint, direction), count in sorted(self.io_bytes.items())
+            ])
+            metric('image_decode_seconds_total', 'counter', 'Pillow 解码图片的时间', [
+                ('', {'endpoint': endpoint}, seconds)
+                for endpoint, seconds in sorted(self.decode_seconds.items())
+            ])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class SharedMetricsFile:
+    """
+    gunicorn 工作进程共享的指标文件。各进程把新增的计数加到文件中，文件保存所有进程的合计，
+    工作进程重启（如 --max-requests）后计数不会回退，Prometheus 的 rate() 可以正常计算。
+    读写时用 flock 加锁，文件需要在同一台机器上
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning(f"指标文件损坏，重新开始计数: {self.path}")
+            return {}
+
+    def add(self, snapshot):
+        """
+        把一个进程新增的计数加到文件中
+
+        参数:
+            snapshot: MetricsRegistry.snapshot() 的结果
+        返回:
+            合计后的 MetricsRegistry
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            total = MetricsRegistry()
+            total.merge(self._read())
+            total.merge(snapshot)
+            # 先写入临时文件再替换，进程中途退出时不会留下不完整的文件
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(total.snapshot(), f)
+            os.replace(temp_path, self.path)
+        return total
+
+
+# 本进程上次合并之后新增的计数
+registry = MetricsRegistry()
+_shared = None
+_last_flush = time.monotonic()
+
+
+def flush_metrics():
+    """
+    把本进程新增的计数合并到共享文件
+
+    返回:
+        所有进程的合计，写入失败时返回 None（新增的计数保留到下次合并）
+    """
+    global _last_flush
+    _last_flush = time.monotonic()
+    snapshot = registry.snapshot(reset=True)
+    try:
+        return _shared.add(snapshot)
+    except OSError as e:
+        registry.merge(snapshot)
+        logger.warning(f"写入指标文件失败: {e}")
+        return None
+
+
+def _flush_at_exit():
+    if _shared is not None and not registry.is_empty():
+        flush_metrics()
+
+
+def _current_stats():
+    if not has_request_context():
+        return None
+    return g.get('request_stats')
+
+
+def record_io(direction, size):
+    """
+    记录当前请求读写的文件字节数，不在请求中时忽略（如后台工作进程）
+
+    参数:
+        direction: 'read' 或 'write'
+        size: 字节数
+    """
+    stats = _current_stats()
+    if stats is None or not size:
+        return
+    if direction == 'read':
+        stats.read_bytes += size
+    else:
+        stats.write_bytes += size
+
+
+@contextmanager
+def measure_decode():
+    """统计代码块中 Pillow 解码图片的时间，计入当前请求"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_stats()
+        if stats is not None:
+            stats.decode_seconds += time.perf_counter() - start
+
+
+def _server_timing(stats, duration):
+    return ', '.join([
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"',
+        f'io;desc="read {stats.read_bytes} B, write {stats.write_bytes} B"',
+        f'decode;dur={stats.decode_seconds * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ])
+
+
+def init_metrics(app):
+    """
+    注册请求统计和 /metrics 端点，在 db.init_app 之后调用。
+    各进程的计数每隔 FLUSH_INTERVAL 秒（有请求时）、访问 /metrics 时和进程退出时合并到 METRICS_FILE。
+    没有设置 METRICS_TOKEN 时 /metrics 返回 404，不公开路由和耗时数据。
+    SERVER_TIMING 为 True 时在响应中加入 Server-Timing 头，浏览器开发者工具可以直接查看
+
+    参数:
+        app: Flask 应用
+    """
+    global _shared
+    _shared = SharedMetricsFile(app.config['METRICS_FILE'])
+    atexit.register(_flush_at_exit)
+
+    with app.app_context():
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        stats = _current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(exception_context):
+        # 执行出错时没有 after_cursor_execute，丢弃对应的开始时间
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+    @app.before_request
+    def start_request_stats():
+        if request.endpoint != 'metrics':
+            g.request_stats = RequestStats()
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get('request_stats')
+        if stats is None:
+            return response
+        stats.status = response.status_code
+        if current_app.config['SERVER_TIMING']:
+            # 流式响应在发送内容时的查询不包含在响应头中
+            response.headers['Server-Timing'] = _server_timing(stats, time.perf_counter() - stats.start)
+        return response
+
+    @app.teardown_request
+    def observe_request(exc):
+        # 使用 stream_with_context 的响应（如 EXIF 导出）在内容发送完后才结束请求，耗时和查询都计算在内；
+        # 其他响应在交给服务器发送前记录，不包含网络传输时间
+        stats = g.pop('request_stats', None)
+        if stats is not None:
+            registry.observe(request.endpoint or 'none', request.method, stats.status, stats,
+                             time.perf_counter() - stats.start)
+            if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+                flush_metrics()
+
+    @app.route('/metrics')
+    def metrics():
+        token = current_app.config['METRICS_TOKEN']
+        if not token:
+            abort(404)
+        # 按固定时间比较，避免从响应时间推测令牌；头部可能含非 ASCII 字符，按字节比较
+        authorization = request.headers.get('Authorization', '').encode()
+        if not hmac.compare_digest(authorization, f'Bearer {token}'.encode()):
+            abort(403)
+        total = flush_metrics()
+        if total is None:
+            abort(503)
+        return current_app.response_class(total.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,37 @@
+"""backfill missing image upload_date
+
+Revision ID: 1d71f6d7bf99
+Revises: 38b5b98adff5
+Create Date: 2026-10-18 11:48:09.730415
+
+文件夹图片列表按 (upload_date, id) 分页，旧记录的 upload_date 不能为空。
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d71f6d7bf99'
+down_revision = '38b5b98adff5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 优先使用所在文件夹的创建时间，文件夹也没有时间时使用固定值
+    op.execute(
+        "UPDATE image SET upload_date = "
+        "(SELECT folder.created_at FROM folder WHERE folder.id = image.folder_id) "
+        "WHERE upload_date IS NULL"
+    )
+    op.execute(
+        sa.text("UPDATE image SET upload_date = :epoch WHERE upload_date IS NULL")
+        .bindparams(sa.bindparam('epoch', datetime(1970, 1, 1), type_=sa.DateTime()))
+    )
+
+
+def downgrade():
+    pass
@@ -0,0 +1,39 @@
+"""add indexes for hot lookups
+
+Revision ID: 38b5b98adff5
+Revises: b54f0dd0cad8
+Create Date: 2026-10-18 11:05:22.648173
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '38b5b98adff5'
+down_revision = 'b54f0dd0cad8'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_folder_user_id_name', 'folder', ['user_id', 'name']),
+    ('ix_image_folder_id_file_hash', 'image', ['folder_id', 'file_hash']),
+    ('ix_image_folder_id_upload_date', 'image', ['folder_id', 'upload_date', 'id']),
+    ('ix_image_filename', 'image', ['filename']),
+    ('ix_image_blob_hash', 'image', ['blob_hash']),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        # 新建的数据库由 db.create_all() 直接创建了索引
+        if name in {i['name'] for i in inspector.get_indexes(table)}:
+            continue
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
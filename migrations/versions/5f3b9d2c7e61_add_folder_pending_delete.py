@@ -0,0 +1,30 @@
+"""add folder.pending_delete
+
+Revision ID: 5f3b9d2c7e61
+Revises: 7c2e0f4a8d16
+Create Date: 2026-10-18 16:02:14.583120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f3b9d2c7e61'
+down_revision = '7c2e0f4a8d16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'pending_delete' in {c['name'] for c in sa.inspect(op.get_bind()).get_columns('folder')}:
+        return
+
+    with op.batch_alter_table('folder', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pending_delete', sa.Boolean(), nullable=False,
+                                      server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('folder', schema=None) as batch_op:
+        batch_op.drop_column('pending_delete')
@@ -0,0 +1,43 @@
+"""add bulk_exif_edit table
+
+Revision ID: 7c2e0f4a8d16
+Revises: e4a7c1d95b20
+Create Date: 2026-10-18 14:20:51.336702
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e0f4a8d16'
+down_revision = 'e4a7c1d95b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if sa.inspect(op.get_bind()).has_table('bulk_exif_edit'):
+        return
+
+    op.create_table('bulk_exif_edit',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('operations', sa.JSON(), nullable=False),
+    sa.Column('image_ids', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.Integer(), nullable=False),
+    sa.Column('unchanged', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('results', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('bulk_exif_edit')
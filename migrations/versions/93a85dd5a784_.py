@@ -17,31 +17,26 @@ depends_on = None
 
 
 def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('_alembic_tmp_image')
-    with op.batch_alter_table('image', schema=None) as batch_op:
-        batch_op.add_column(sa.Column('upload_date', sa.DateTime(), nullable=True))
-        batch_op.drop_column('uploaded_at')
+    inspector = sa.inspect(op.get_bind())
+
+    # _alembic_tmp_image 是 SQLite 上一次中断的 batch 操作留下的临时表，其他数据库没有
+    if inspector.has_table('_alembic_tmp_image'):
+        op.drop_table('_alembic_tmp_image')
 
-    # ### end Alembic commands ###
+    # 新数据库由 db.create_all() 按当前模型建表，已经是修改后的结构
+    columns = {c['name'] for c in inspector.get_columns('image')}
+    if 'upload_date' in columns and 'uploaded_at' not in columns:
+        return
+
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        if 'upload_date' not in columns:
+            batch_op.add_column(sa.Column('upload_date', sa.DateTime(), nullable=True))
+        if 'uploaded_at' in columns:
+            batch_op.drop_column('uploaded_at')
 
 
 def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
+    # 不再重建 SQLite 留下的临时表
     with op.batch_alter_table('image', schema=None) as batch_op:
-        batch_op.add_column(sa.Column('uploaded_at', sa.DATETIME(), nullable=True))
+        batch_op.add_column(sa.Column('uploaded_at', sa.DateTime(), nullable=True))
         batch_op.drop_column('upload_date')
-
-    op.create_table('_alembic_tmp_image',
-    sa.Column('id', sa.INTEGER(), nullable=False),
-    sa.Column('filename', sa.VARCHAR(length=255), nullable=False),
-    sa.Column('original_filename', sa.VARCHAR(length=255), nullable=False),
-    sa.Column('folder_id', sa.INTEGER(), nullable=False),
-    sa.Column('file_hash', sa.VARCHAR(length=64), nullable=True),
-    sa.Column('user_id', sa.INTEGER(), nullable=False),
-    sa.Column('upload_date', sa.DATETIME(), nullable=True),
-    sa.ForeignKeyConstraint(['folder_id'], ['folder.id'], ),
-    sa.ForeignKeyConstraint(['user_id'], ['user.id'], name='fk_image_user'),
-    sa.PrimaryKeyConstraint('id')
-    )
-    # ### end Alembic commands ###
@@ -0,0 +1,44 @@
+"""add import_run table
+
+Revision ID: a8e6c3f1b247
+Revises: 5f3b9d2c7e61
+Create Date: 2026-10-18 17:25:40.918236
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8e6c3f1b247'
+down_revision = '5f3b9d2c7e61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if sa.inspect(op.get_bind()).has_table('import_run'):
+        return
+
+    op.create_table('import_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=1024), nullable=False),
+    sa.Column('folder_name', sa.String(length=80), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('imported', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('import_run')
@@ -0,0 +1,40 @@
+"""add upload_session table for chunked uploads
+
+Revision ID: b19f66c63d73
+Revises: 1d71f6d7bf99
+Create Date: 2026-10-18 13:02:37.415209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b19f66c63d73'
+down_revision = '1d71f6d7bf99'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if sa.inspect(op.get_bind()).has_table('upload_session'):
+        return
+
+    op.create_table('upload_session',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('folder_id', sa.Integer(), nullable=False),
+    sa.Column('original_filename', sa.String(length=255), nullable=False),
+    sa.Column('total_size', sa.BigInteger(), nullable=False),
+    sa.Column('file_hash', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['folder_id'], ['folder.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('upload_session')
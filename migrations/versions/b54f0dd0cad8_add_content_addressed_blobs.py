@@ -0,0 +1,45 @@
+"""add content addressed blob store
+
+Revision ID: b54f0dd0cad8
+Revises: caa244518bfd
+Create Date: 2026-10-18 10:31:47.052918
+
+数据库结构升级后运行 `flask storage migrate-blobs` 将已有文件转换为 Blob。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b54f0dd0cad8'
+down_revision = 'caa244518bfd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if not inspector.has_table('blob'):
+        op.create_table('blob',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('hash')
+        )
+
+    if 'blob_hash' not in {c['name'] for c in inspector.get_columns('image')}:
+        with op.batch_alter_table('image', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('blob_hash', sa.String(length=64), nullable=True))
+            batch_op.create_foreign_key('fk_image_blob_hash', 'blob', ['blob_hash'], ['hash'])
+
+
+def downgrade():
+    with op.batch_alter_table('image', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_image_blob_hash', type_='foreignkey')
+        batch_op.drop_column('blob_hash')
+
+    op.drop_table('blob')
@@ -0,0 +1,35 @@
+"""add image_exif index table
+
+Revision ID: caa244518bfd
+Revises: 93a85dd5a784
+Create Date: 2026-10-18 09:12:04.311852
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'caa244518bfd'
+down_revision = '93a85dd5a784'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if sa.inspect(op.get_bind()).has_table('image_exif'):
+        return
+
+    op.create_table('image_exif',
+    sa.Column('image_id', sa.Integer(), nullable=False),
+    sa.Column('exif_data', sa.JSON(), nullable=False),
+    sa.Column('tag_ids', sa.JSON(), nullable=False),
+    sa.Column('indexed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['image_id'], ['image.id'], ),
+    sa.PrimaryKeyConstraint('image_id')
+    )
+
+
+def downgrade():
+    op.drop_table('image_exif')
@@ -0,0 +1,29 @@
+"""widen user.password_hash
+
+Revision ID: d3f8a2b61c47
+Revises: a8e6c3f1b247
+Create Date: 2026-10-18 19:42:07.316254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a2b61c47'
+down_revision = 'a8e6c3f1b247'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # werkzeug 的 scrypt 哈希超过 128 个字符，SQLite 不检查长度，PostgreSQL 会拒绝写入
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128),
+                              type_=sa.String(length=256), existing_nullable=True)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=256),
+                              type_=sa.String(length=128), existing_nullable=True)
@@ -0,0 +1,47 @@
+"""add job table for background processing
+
+Revision ID: e4a7c1d95b20
+Revises: b19f66c63d73
+Create Date: 2026-10-18 13:41:12.208934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c1d95b20'
+down_revision = 'b19f66c63d73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 应用启动时 db.create_all() 可能已经建好了这张表
+    if sa.inspect(op.get_bind()).has_table('job'):
+        return
+
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('task', sa.String(length=64), nullable=False),
+    sa.Column('image_id', sa.Integer(), nullable=True),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('run_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['image_id'], ['image.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_status_run_at', 'job', ['status', 'run_at'], unique=False)
+    op.create_index('ix_job_image_id', 'job', ['image_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_image_id', table_name='job')
+    op.drop_index('ix_job_status_run_at', table_name='job')
+    op.drop_table('job')
@@ -8,7 +8,8 @@ db = SQLAlchemy()
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    # werkzeug 默认的 scrypt 哈希长约 160 个字符
+    password_hash = db.Column(db.String(256))
     folders = db.relationship('Folder', backref='user', lazy=True)
     
     def set_password(self, password):
@@ -18,13 +19,38 @@ class User(UserMixin, db.Model):
         return check_password_hash(self.password_hash, password)
 
 class Folder(db.Model):
+    __table_args__ = (
+        # 首页按用户列出文件夹、创建时检查同名文件夹
+        db.Index('ix_folder_user_id_name', 'user_id', 'name'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 已提交删除，图片和文件由后台任务分批删除，期间文件夹对用户不可见
+    pending_delete = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     images = db.relationship('Image', backref='folder', lazy=True)
 
+class Blob(db.Model):
+    # 按 SHA-256 存储的文件内容，相同内容的图片共享同一个 Blob
+    hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Image(db.Model):
+    __table_args__ = (
+        # 上传去重：按文件夹和哈希查找
+        db.Index('ix_image_folder_id_file_hash', 'folder_id', 'file_hash'),
+        # 文件夹内按上传时间列出图片
+        db.Index('ix_image_folder_id_upload_date', 'folder_id', 'upload_date', 'id'),
+        # 按文件名访问图片和EXIF接口
+        db.Index('ix_image_filename', 'filename'),
+        # 释放 Blob 时统计引用
+        db.Index('ix_image_blob_hash', 'blob_hash'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     original_filename = db.Column(db.String(255), nullable=False)
@@ -32,6 +58,88 @@ class Image(db.Model):
     folder_id = db.Column(db.Integer, db.ForeignKey('folder.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # 文件内容所在的 Blob，为空表示仍存放在旧的 uploads/<用户>/<文件夹>/ 目录中
+    blob_hash = db.Column(db.String(64), db.ForeignKey('blob.hash'), nullable=True)
+    blob = db.relationship('Blob', lazy=True)
+    exif = db.relationship('ImageExif', backref='image', uselist=False, lazy=True,
+                           cascade='all, delete-orphan')
+    jobs = db.relationship('Job', backref='image', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Image {self.filename}>'
+
+class UploadSession(db.Model):
+    # 分块上传会话，已接收的内容追加在临时文件中，文件长度就是下一块的偏移量
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    folder_id = db.Column(db.Integer, db.ForeignKey('folder.id'), nullable=False)
+    original_filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    # 客户端声明的哈希值，完成时与服务器计算的结果比较
+    file_hash = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Job(db.Model):
+    __table_args__ = (
+        # 工作进程按状态和计划时间领取任务
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+        db.Index('ix_job_image_id', 'image_id'),
+    )
+    
+    # 后台任务，由 flask jobs work 启动的工作进程执行
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(64), nullable=False)
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'), nullable=True)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    # pending / running / done / failed / cancelled（执行期间图片被删除）
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class BulkExifEdit(db.Model):
+    # 批量修改EXIF的请求，由后台任务执行，记录进度和每个文件的结果
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    operations = db.Column(db.JSON, nullable=False)
+    image_ids = db.Column(db.JSON, nullable=False)
+    # pending / running / done / failed
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    unchanged = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    # 每个文件的结果: {image_id, status, error}
+    results = db.Column(db.JSON, nullable=False, default=list)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ImportRun(db.Model):
+    # 服务器端批量导入目录或 ZIP，记录进度；重新执行时按内容哈希跳过已导入的文件
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    source = db.Column(db.String(1024), nullable=False)
+    # 顶层文件导入的文件夹，子目录导入为 "<folder_name>/<子目录>"
+    folder_name = db.Column(db.String(80), nullable=False)
+    # pending / running / done / failed
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    total = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ImageExif(db.Model):
+    # 上传时解析一次的EXIF信息，避免每次访问都读取文件
+    image_id = db.Column(db.Integer, db.ForeignKey('image.id'), primary_key=True)
+    exif_data = db.Column(db.JSON, nullable=False, default=dict)
+    tag_ids = db.Column(db.JSON, nullable=False, default=dict)
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
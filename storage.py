@@ -0,0 +1,409 @@
+import hashlib
+import mimetypes
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case
+from sqlalchemy.dialects import postgresql, sqlite
+
+from metrics import record_io
+from models import db, Blob, Image, UploadSession
+from thumbnails import invalidate_thumbnails
+
+storage_cli = AppGroup('storage', help='文件存储管理')
+
+# 读取文件时使用的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def get_folder_dir(user_id, folder_id):
+    """
+    获取文件夹对应的物理目录（旧的存储方式）
+
+    参数:
+        user_id: 用户ID
+        folder_id: 文件夹ID
+    返回:
+        目录路径
+    """
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], str(user_id), str(folder_id))
+
+
+def get_blob_path(blob_hash):
+    """
+    获取 Blob 文件路径，按哈希前缀分两级目录避免单个目录文件过多
+
+    参数:
+        blob_hash: SHA-256 十六进制字符串
+    返回:
+        文件路径
+    """
+    return os.path.join(current_app.config['BLOB_FOLDER'], blob_relative_path(blob_hash))
+
+
+def blob_relative_path(blob_hash):
+    """Blob 文件相对 BLOB_FOLDER 的路径，子进程中没有应用上下文时使用"""
+    return os.path.join(blob_hash[:2], blob_hash[2:4], blob_hash)
+
+
+def get_legacy_image_path(image):
+    """获取图片在旧存储方式下的路径"""
+    return os.path.join(get_folder_dir(image.user_id, image.folder_id), image.filename)
+
+
+def get_image_path(image):
+    """
+    获取图片原文件的路径
+
+    参数:
+        image: Image 记录
+    返回:
+        文件路径
+    """
+    if image.blob_hash:
+        return get_blob_path(image.blob_hash)
+    return get_legacy_image_path(image)
+
+
+def get_image_mimetype(image):
+    """Blob 文件没有扩展名，根据图片文件名推断类型"""
+    return mimetypes.guess_type(image.filename)[0] or 'application/octet-stream'
+
+
+def new_staging_path():
+    """
+    获取临时文件路径，与 Blob 在同一文件系统中，可以原子移动
+
+    返回:
+        临时文件路径
+    """
+    return os.path.join(get_staging_dir(), f"{uuid.uuid4().hex}.tmp")
+
+
+def get_staging_dir():
+    """获取临时文件目录，不存在时创建"""
+    staging_dir = os.path.join(current_app.config['BLOB_FOLDER'], 'tmp')
+    os.makedirs(staging_dir, exist_ok=True)
+    return staging_dir
+
+
+def get_upload_part_path(upload_id):
+    """
+    获取分块上传会话的临时文件路径，与 Blob 在同一文件系统中
+
+    参数:
+        upload_id: 上传会话ID
+    返回:
+        临时文件路径
+    """
+    return os.path.join(get_staging_dir(), f"{upload_id}.part")
+
+
+def append_stream(stream, file_path, length):
+    """
+    将数据流分块追加到文件末尾，连接中断时已写入的部分保留，可以从新的偏移量继续
+
+    参数:
+        stream: 可读的文件对象（如请求的 stream）
+        file_path: 目标文件路径
+        length: 最多读取的字节数
+    返回:
+        实际写入的字节数
+    """
+    written = 0
+    with open(file_path, 'ab') as f:
+        while written < length:
+            chunk = stream.read(min(CHUNK_SIZE, length - written))
+            if not chunk:
+                break
+            f.write(chunk)
+            written += len(chunk)
+    record_io('write', written)
+    return written
+
+
+def save_stream_with_hash(stream, file_path):
+    """
+    将数据流分块写入文件，同时计算 SHA-256 哈希值，不需要再次读取文件
+
+    参数:
+        stream: 可读的文件对象（如上传文件的 stream）
+        file_path: 目标文件路径
+    返回:
+        (十六进制哈希字符串, 文件大小)
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    record_io('write', size)
+    return sha256.hexdigest(), size
+
+
+def compute_file_hash(file_path):
+    """
+    分块计算文件的 SHA-256 哈希值
+
+    参数:
+        file_path: 文件路径
+    返回:
+        十六进制哈希字符串
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def store_blob(temp_path, blob_hash, size):
+    """
+    将临时文件存入 Blob 并增加引用计数，内容已存在时直接丢弃临时文件（不提交事务）
+
+    参数:
+        temp_path: 临时文件路径，调用后不再存在
+        blob_hash: 文件的 SHA-256
+        size: 文件大小
+    """
+    # 插入和加一在同一条语句中完成，多个进程同时上传相同的新内容时不会主键冲突，也不会丢失计数
+    dialect = db.session.get_bind().dialect.name
+    statement = UPSERT_INSERTS[dialect](Blob).values(hash=blob_hash, size=size, ref_count=1)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[Blob.hash], set_={'ref_count': Blob.ref_count + 1}
+    ))
+
+    # remove_files 删除文件前会等待这里的事务提交，文件存在时可以直接丢弃临时文件
+    blob_path = get_blob_path(blob_hash)
+    if os.path.exists(blob_path):
+        os.remove(temp_path)
+        return
+
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    os.replace(temp_path, blob_path)
+
+
+def release_blob(blob_hash):
+    """
+    减少 Blob 的引用计数，计数归零时删除记录（不提交事务）。
+    image.blob_hash 有外键约束，需要在引用它的图片记录删除或改为其他 Blob 并 flush 之后调用
+
+    参数:
+        blob_hash: 文件的 SHA-256
+    返回:
+        需要在提交后删除的文件路径列表
+    """
+    Blob.query.filter_by(hash=blob_hash).update(
+        {Blob.ref_count: Blob.ref_count - 1}, synchronize_session=False
+    )
+    deleted = Blob.query.filter(Blob.hash == blob_hash, Blob.ref_count <= 0).delete(
+        synchronize_session=False
+    )
+    return [get_blob_path(blob_hash)] if deleted else []
+
+
+def release_blobs(counts):
+    """
+    批量减少多个 Blob 的引用计数，计数归零时删除记录（不提交事务）。
+    与 release_blob 相同，需要在引用这些 Blob 的图片记录删除之后调用
+
+    参数:
+        counts: {文件哈希: 要减少的引用数}
+    返回:
+        需要在提交后删除的文件路径列表
+    """
+    if not counts:
+        return []
+    hashes = list(counts)
+    Blob.query.filter(Blob.hash.in_(hashes)).update(
+        {Blob.ref_count: Blob.ref_count - case(counts, value=Blob.hash, else_=0)},
+        synchronize_session=False
+    )
+    released = [blob_hash for (blob_hash,) in db.session.query(Blob.hash).filter(
+        Blob.hash.in_(hashes), Blob.ref_count <= 0
+    )]
+    if released:
+        Blob.query.filter(Blob.hash.in_(released)).delete(synchronize_session=False)
+    return [get_blob_path(blob_hash) for blob_hash in released]
+
+
+def release_image_content(image):
+    """
+    释放图片占用的文件（不提交事务），在图片记录删除并 flush 之后调用
+
+    参数:
+        image: Image 记录，已删除的记录仍保留加载过的属性
+    返回:
+        需要在提交后删除的文件路径列表
+    """
+    if image.blob_hash:
+        return release_blob(image.blob_hash)
+    return [get_legacy_image_path(image)]
+
+
+def replace_image_content(image, temp_path, new_hash=None):
+    """
+    用新文件替换图片内容（如修改EXIF后），旧内容可能仍被其他图片引用，所以写入新的 Blob
+
+    参数:
+        image: Image 记录
+        temp_path: 新内容的临时文件路径，调用后不再存在
+        new_hash: 新内容的哈希值，已经计算过时传入，避免重复读取文件
+    返回:
+        需要在提交后删除的文件路径列表
+    """
+    new_hash = new_hash or compute_file_hash(temp_path)
+    if new_hash == image.blob_hash:
+        os.remove(temp_path)
+        return []
+
+    store_blob(temp_path, new_hash, os.path.getsize(temp_path))
+    old_hash = image.blob_hash
+    legacy_path = None if old_hash else get_legacy_image_path(image)
+
+    # 先让图片引用新的 Blob，旧 Blob 没有引用后才能删除，否则违反外键约束
+    image.blob_hash = new_hash
+    image.file_hash = new_hash
+    db.session.flush()
+    return release_blob(old_hash) if old_hash else [legacy_path]
+
+
+def remove_files(paths):
+    """
+    删除文件，在数据库事务提交后调用。Blob 文件删除前会重新确认没有引用，与删除记录一起提交
+
+    参数:
+        paths: 文件路径列表
+    """
+    blob_folder = os.path.abspath(current_app.config['BLOB_FOLDER'])
+    blob_paths = {}
+    for path in paths:
+        if os.path.abspath(path).startswith(blob_folder + os.sep):
+            blob_paths[os.path.basename(path)] = path
+        else:
+            _remove_file(path)
+    if blob_paths:
+        _remove_blob_files(blob_paths)
+
+
+def _remove_blob_files(blob_paths):
+    """
+    删除没有引用的 Blob 文件和记录并提交。
+    同时上传相同内容时，store_blob 可能已经插入 Blob 但还没有提交，看到文件存在就丢弃了临时文件。
+    这里先插入引用数为 0 的占位记录，与未提交的插入冲突时等待对方提交；再锁定仍没有引用的记录，
+    删除文件后提交。store_blob 的插入同样会等待这里提交，之后发现文件不存在会重新移入
+
+    参数:
+        blob_paths: {文件哈希: 文件路径}
+    """
+    hashes = list(blob_paths)
+    dialect = db.session.get_bind().dialect.name
+    db.session.execute(UPSERT_INSERTS[dialect](Blob).values([
+        {'hash': blob_hash, 'size': 0, 'ref_count': 0} for blob_hash in hashes
+    ]).on_conflict_do_nothing(index_elements=[Blob.hash]))
+    # PostgreSQL 上锁定记录，等待其他事务的引用计数修改；SQLite 插入时已经持有写锁
+    released = [blob_hash for (blob_hash,) in db.session.query(Blob.hash).filter(
+        Blob.hash.in_(hashes), Blob.ref_count <= 0
+    ).with_for_update()]
+    if released:
+        Blob.query.filter(Blob.hash.in_(released)).delete(synchronize_session=False)
+    for blob_hash in released:
+        _remove_file(blob_paths[blob_hash])
+    db.session.commit()
+
+
+def _remove_file(path):
+    """删除文件，文件不存在时忽略"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_legacy_folder_dir(user_id, folder_id):
+    """删除旧存储方式下的文件夹目录"""
+    shutil.rmtree(get_folder_dir(user_id, folder_id), ignore_errors=True)
+
+
+@storage_cli.command('migrate-blobs')
+@click.option('--batch-size', default=100, show_default=True, help='每批提交的图片数')
+def migrate_blobs_command(batch_size):
+    """将 uploads/<用户>/<文件夹>/ 中的旧文件原地转换为 Blob，可以中断后重新运行"""
+    migrated = 0
+    missing = 0
+    last_id = 0
+    while True:
+        batch = Image.query.filter(Image.blob_hash.is_(None), Image.id > last_id) \
+            .order_by(Image.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        legacy_paths = []
+        for image in batch:
+            legacy_path = get_legacy_image_path(image)
+            if not os.path.exists(legacy_path):
+                missing += 1
+                click.echo(f"文件不存在，跳过: {legacy_path}")
+                continue
+
+            blob_hash = compute_file_hash(legacy_path)
+            # 用硬链接代替复制，原文件在提交后才删除，中断时不会丢失数据
+            temp_path = new_staging_path()
+            try:
+                os.link(legacy_path, temp_path)
+            except OSError:
+                shutil.copy2(legacy_path, temp_path)
+            store_blob(temp_path, blob_hash, os.path.getsize(legacy_path))
+
+            if image.file_hash != blob_hash:
+                invalidate_thumbnails(image)
+            image.blob_hash = blob_hash
+            image.file_hash = blob_hash
+            legacy_paths.append(legacy_path)
+            migrated += 1
+
+        db.session.commit()
+        for path in legacy_paths:
+            os.remove(path)
+        click.echo(f"已转换 {migrated} 张图片")
+
+    # 删除已经清空的旧目录
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    for user_dir in os.listdir(upload_folder):
+        user_path = os.path.join(upload_folder, user_dir)
+        if not user_dir.isdigit() or not os.path.isdir(user_path):
+            continue
+        for folder_dir in os.listdir(user_path):
+            folder_path = os.path.join(user_path, folder_dir)
+            if os.path.isdir(folder_path) and not os.listdir(folder_path):
+                os.rmdir(folder_path)
+
+    click.echo(f"完成: 转换 {migrated} 张，缺少文件 {missing} 张")
+
+
+@storage_cli.command('clean-uploads')
+@click.option('--max-age-hours', default=24, show_default=True, help='超过该时间未更新的上传会话将被删除')
+def clean_uploads_command(max_age_hours):
+    """删除长时间未完成的分块上传会话及其临时文件"""
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    sessions = UploadSession.query.filter(UploadSession.updated_at < cutoff).all()
+    part_paths = [get_upload_part_path(upload.id) for upload in sessions]
+    for upload in sessions:
+        db.session.delete(upload)
+    db.session.commit()
+    remove_files(part_paths)
+    click.echo(f"已删除 {len(sessions)} 个过期的上传会话")
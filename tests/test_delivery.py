@@ -0,0 +1,109 @@
+"""
+delivery.send_cached_file 的 Range 请求：单区间、多区间 multipart、无法满足的区间、
+If-Range 不匹配和区间数超过 MAX_RANGES 的情况
+"""
+import re
+
+import pytest
+from flask import Flask
+
+from delivery import MAX_RANGES, send_cached_file
+
+CONTENT = bytes(range(256)) * 4
+ETAG = 'a' * 64
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / 'photo.jpg'
+    path.write_bytes(CONTENT)
+
+    app = Flask(__name__)
+    app.config['FILE_DELIVERY'] = 'direct'
+
+    @app.route('/file')
+    def serve():
+        return send_cached_file(str(path), ETAG, None, mimetype='image/jpeg')
+
+    return app.test_client()
+
+
+def parse_multipart(response):
+    """返回 [(Content-Range, 内容)]"""
+    boundary = re.search(r'boundary=(\S+)', response.headers['Content-Type']).group(1).encode()
+    parts = []
+    for part in response.data.split(b'--' + boundary)[1:-1]:
+        head, _, body = part.partition(b'\r\n\r\n')
+        content_range = re.search(rb'Content-Range: (.+)', head).group(1).decode().strip()
+        parts.append((content_range, body[:-2]))
+    return parts
+
+
+def test_single_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(CONTENT)}'
+    assert response.data == CONTENT[10:20]
+
+
+def test_suffix_range(client):
+    response = client.get('/file', headers={'Range': 'bytes=-5'})
+    assert response.status_code == 206
+    assert response.data == CONTENT[-5:]
+
+
+def test_multiple_ranges(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-3,100-109,-4'})
+    assert response.status_code == 206
+    assert response.mimetype == 'multipart/byteranges'
+    assert response.content_length == len(response.data)
+    assert response.headers['ETag'] == f'"{ETAG}"'
+    size = len(CONTENT)
+    assert parse_multipart(response) == [
+        (f'bytes 0-3/{size}', CONTENT[0:4]),
+        (f'bytes 100-109/{size}', CONTENT[100:110]),
+        (f'bytes {size - 4}-{size - 1}/{size}', CONTENT[-4:]),
+    ]
+
+
+def test_adjacent_ranges_are_merged(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9,10-19'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f'bytes 0-19/{len(CONTENT)}'
+    assert response.data == CONTENT[0:20]
+
+
+@pytest.mark.parametrize('header', [
+    f'bytes={len(CONTENT)}-',
+    f'bytes={len(CONTENT)}-{len(CONTENT) + 10},{len(CONTENT) + 20}-',
+])
+def test_unsatisfiable_range(client, header):
+    response = client.get('/file', headers={'Range': header})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+@pytest.mark.parametrize('header', ['bytes=0-9', 'bytes=0-9,20-29'])
+def test_if_range_mismatch_returns_full_file(client, header):
+    response = client.get('/file', headers={'Range': header, 'If-Range': '"other"'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+
+
+def test_if_range_match(client):
+    response = client.get('/file', headers={'Range': 'bytes=0-9,20-29', 'If-Range': f'"{ETAG}"'})
+    assert response.status_code == 206
+
+
+def test_too_many_ranges_returns_full_file(client):
+    ranges = ','.join(f'{i * 10}-{i * 10 + 1}' for i in range(MAX_RANGES + 4))
+    response = client.get('/file', headers={'Range': f'bytes={ranges}'})
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert response.headers['ETag'] == f'"{ETAG}"'
+    assert 'Content-Range' not in response.headers
+
+
+def test_not_modified(client):
+    response = client.get('/file', headers={'If-None-Match': f'"{ETAG}"', 'Range': 'bytes=0-9'})
+    assert response.status_code == 304
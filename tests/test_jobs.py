@@ -0,0 +1,82 @@
+"""
+jobs.run_job 在执行期间任务被删除或取消时的处理：不抛出异常、不重试、不覆盖取消状态
+"""
+import pytest
+from flask import Flask
+
+from jobs import cancel_image_jobs, claim_job, enqueue, run_job, task
+from models import db, Folder, Image, Job, User
+
+
+@task('test_delete_own_job')
+def delete_own_job_task(job):
+    Job.query.filter_by(id=job.id).delete(synchronize_session=False)
+    db.session.commit()
+    raise RuntimeError('图片已删除')
+
+
+@task('test_cancel_own_job')
+def cancel_own_job_task(job):
+    cancel_image_jobs([job.image_id])
+    db.session.commit()
+
+
+@task('test_fail')
+def fail_task(job):
+    raise RuntimeError('失败')
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['JOB_MAX_ATTEMPTS'] = 5
+    app.config['JOB_TIMEOUT'] = 600
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        user = User(username='test')
+        folder = Folder(name='test', user=user)
+        db.session.add(Image(filename='a.jpg', original_filename='a.jpg', folder=folder, user_id=1))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def run_task(task_name):
+    enqueue(task_name, db.session.get(Image, 1))
+    db.session.commit()
+    job = claim_job()
+    assert job.task == task_name
+    return job.id, run_job(job)
+
+
+def test_job_deleted_while_running(app):
+    job_id, succeeded = run_task('test_delete_own_job')
+    assert succeeded is False
+    assert db.session.get(Job, job_id) is None
+
+
+def test_job_cancelled_while_running(app):
+    job_id, _ = run_task('test_cancel_own_job')
+    job = db.session.get(Job, job_id)
+    assert job.status == 'cancelled'
+    assert job.image_id is None
+    assert job.attempts == 0
+
+
+def test_failed_job_is_retried(app):
+    job_id, succeeded = run_task('test_fail')
+    assert succeeded is False
+    job = db.session.get(Job, job_id)
+    assert job.status == 'pending'
+    assert job.attempts == 1
+    assert 'RuntimeError' in job.last_error
+
+
+def test_cancel_image_jobs_deletes_pending_jobs(app):
+    enqueue('test_fail', db.session.get(Image, 1))
+    db.session.commit()
+    cancel_image_jobs([1])
+    db.session.commit()
+    assert Job.query.count() == 0
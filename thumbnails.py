@@ -0,0 +1,104 @@
+import glob
+import os
+import shutil
+import uuid
+from flask import current_app
+from PIL import Image, ImageOps
+
+from metrics import measure_decode
+
+# 支持的缩略图尺寸（最长边像素）
+THUMBNAIL_SIZES = (256, 1024)
+
+
+def get_thumbnail_dir(user_id, folder_id):
+    """
+    获取文件夹对应的缩略图目录，与原图目录分开存放
+
+    参数:
+        user_id: 用户ID
+        folder_id: 文件夹ID
+    返回:
+        目录路径
+    """
+    return os.path.join(current_app.config['THUMBNAIL_FOLDER'], str(user_id), str(folder_id))
+
+
+def get_thumbnail_path(image, size):
+    """
+    获取缩略图路径，文件名由图片ID、内容哈希和尺寸组成
+
+    参数:
+        image: Image 记录
+        size: 缩略图尺寸
+    返回:
+        缩略图路径
+    """
+    version = (image.file_hash or 'nohash')[:16]
+    return os.path.join(
+        get_thumbnail_dir(image.user_id, image.folder_id),
+        f"{image.id}_{version}_{size}.jpg"
+    )
+
+
+def get_or_create_thumbnail(image, source_path, size):
+    """
+    获取缩略图，不存在时从原图生成并缓存
+
+    参数:
+        image: Image 记录
+        source_path: 原图路径
+        size: 缩略图尺寸，必须在 THUMBNAIL_SIZES 中
+    返回:
+        缩略图路径
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"不支持的缩略图尺寸: {size}")
+
+    thumb_path = get_thumbnail_path(image, size)
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+
+    with Image.open(source_path) as img:
+        with measure_decode():
+            # JPEG 在解码时直接按比例缩小，避免解码完整分辨率
+            img.draft('RGB', (size, size))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((size, size))
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+
+        # 先写临时文件再替换，避免并发请求读到写了一半的缩略图
+        temp_path = f"{thumb_path}.{uuid.uuid4().hex}.tmp"
+        img.save(temp_path, 'JPEG', quality=85)
+
+    os.replace(temp_path, thumb_path)
+    return thumb_path
+
+
+def invalidate_thumbnails(image):
+    """
+    删除图片的所有缩略图，原图被改写后调用
+
+    参数:
+        image: Image 记录
+    """
+    pattern = os.path.join(get_thumbnail_dir(image.user_id, image.folder_id), f"{image.id}_*")
+    for path in glob.glob(pattern):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def delete_folder_thumbnails(user_id, folder_id):
+    """
+    删除整个文件夹的缩略图目录
+
+    参数:
+        user_id: 用户ID
+        folder_id: 文件夹ID
+    """
+    shutil.rmtree(get_thumbnail_dir(user_id, folder_id), ignore_errors=True)
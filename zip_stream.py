@@ -0,0 +1,198 @@
+import os
+import struct
+import zlib
+from datetime import datetime
+
+# 文件大小、偏移量超过这些值时需要 ZIP64 扩展
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_COUNT_LIMIT = 0xFFFF
+
+# 读取文件时使用的块大小
+CHUNK_SIZE = 1024 * 1024
+
+# 通用标志：bit 3 表示 CRC 和大小写在数据之后的数据描述符中，bit 11 表示文件名为 UTF-8
+_FLAGS = 0x0008 | 0x0800
+_ZIP_STORED = 0
+# 使用 ZIP64 时原字段填写的占位值
+_ZIP64_MARKER = 0xFFFFFFFF
+_ZIP64_COUNT_MARKER = 0xFFFF
+_VERSION = 20
+_VERSION_ZIP64 = 45
+
+_LOCAL_HEADER = struct.Struct('<4sHHHHHLLLHH')
+_CENTRAL_HEADER = struct.Struct('<4sHHHHHHLLLHHHHHLL')
+_END_RECORD = struct.Struct('<4sHHHHLLH')
+_ZIP64_END_RECORD = struct.Struct('<4sQHHLLQQQQ')
+_ZIP64_LOCATOR = struct.Struct('<4sLQL')
+
+
+class ZipEntry:
+    """ZIP 中的一个文件，内容在生成时从磁盘读取"""
+
+    def __init__(self, name, path, size, date_time=None):
+        self.name = name
+        self.encoded_name = name.encode('utf-8')
+        self.path = path
+        self.size = size
+        self.date_time = date_time or datetime.now()
+        # 在生成时计算
+        self.crc = 0
+        self.offset = 0
+
+    @property
+    def zip64(self):
+        return self.size >= ZIP64_LIMIT
+
+
+def unique_archive_names(names):
+    """
+    处理重名文件：同名时在扩展名前加序号，如 a.jpg、a (1).jpg。
+    按不区分大小写比较，避免在 Windows 上解压时互相覆盖
+
+    参数:
+        names: 原始文件名列表
+    返回:
+        与输入顺序相同的文件名列表
+    """
+    used = set()
+    result = []
+    for name in names:
+        # 压缩包中的路径分隔符会被解压成目录
+        name = name.replace('/', '_').replace('\\', '_').strip() or 'unnamed'
+        base, ext = os.path.splitext(name)
+        candidate = name
+        counter = 1
+        while candidate.casefold() in used:
+            candidate = f"{base} ({counter}){ext}"
+            counter += 1
+        used.add(candidate.casefold())
+        result.append(candidate)
+    return result
+
+
+def _dos_date_time(value):
+    # DOS 时间从 1980 年开始，精度为 2 秒
+    if value.year < 1980:
+        value = datetime(1980, 1, 1)
+    date = (value.year - 1980) << 9 | value.month << 5 | value.day
+    time = value.hour << 11 | value.minute << 5 | value.second // 2
+    return date, time
+
+
+def _local_header(entry):
+    date, time = _dos_date_time(entry.date_time)
+    if entry.zip64:
+        # 大小写在数据描述符中，这里的 ZIP64 扩展字段只是声明使用 8 字节的大小
+        extra = struct.pack('<HHQQ', 0x0001, 16, 0, 0)
+        size = _ZIP64_MARKER
+    else:
+        extra = b''
+        size = 0
+    return _LOCAL_HEADER.pack(
+        b'PK\x03\x04', _VERSION_ZIP64 if entry.zip64 else _VERSION, _FLAGS, _ZIP_STORED,
+        time, date, 0, size, size, len(entry.encoded_name), len(extra)
+    ) + entry.encoded_name + extra
+
+
+def _data_descriptor(entry):
+    if entry.zip64:
+        return struct.pack('<4sLQQ', b'PK\x07\x08', entry.crc, entry.size, entry.size)
+    return struct.pack('<4sLLL', b'PK\x07\x08', entry.crc, entry.size, entry.size)
+
+
+def _central_header(entry):
+    date, time = _dos_date_time(entry.date_time)
+    fields = []
+    size = entry.size
+    offset = entry.offset
+    if entry.zip64:
+        fields += [entry.size, entry.size]
+        size = _ZIP64_MARKER
+    if entry.offset >= ZIP64_LIMIT:
+        fields.append(entry.offset)
+        offset = _ZIP64_MARKER
+    extra = struct.pack(f'<HH{len(fields)}Q', 0x0001, 8 * len(fields), *fields) if fields else b''
+    version = _VERSION_ZIP64 if fields else _VERSION
+    return _CENTRAL_HEADER.pack(
+        b'PK\x01\x02', version, version, _FLAGS, _ZIP_STORED, time, date,
+        entry.crc, size, size, len(entry.encoded_name), len(extra), 0, 0, 0, 0, offset
+    ) + entry.encoded_name + extra
+
+
+def _end_records(count, directory_offset, directory_size):
+    records = b''
+    if count >= ZIP_COUNT_LIMIT or directory_offset >= ZIP64_LIMIT or directory_size >= ZIP64_LIMIT:
+        zip64_offset = directory_offset + directory_size
+        records += _ZIP64_END_RECORD.pack(
+            b'PK\x06\x06', _ZIP64_END_RECORD.size - 12, _VERSION_ZIP64, _VERSION_ZIP64,
+            0, 0, count, count, directory_size, directory_offset
+        )
+        records += _ZIP64_LOCATOR.pack(b'PK\x06\x07', 0, zip64_offset, 1)
+        count = _ZIP64_COUNT_MARKER
+        directory_offset = _ZIP64_MARKER
+        directory_size = _ZIP64_MARKER
+    return records + _END_RECORD.pack(
+        b'PK\x05\x06', 0, 0, count, count, directory_size, directory_offset, 0
+    )
+
+
+def _layout(entries):
+    """计算每个文件的偏移量，返回中央目录的偏移量"""
+    offset = 0
+    for entry in entries:
+        entry.offset = offset
+        offset += len(_local_header(entry)) + entry.size + len(_data_descriptor(entry))
+    return offset
+
+
+def archive_size(entries):
+    """
+    计算 ZIP 的总大小，用作 Content-Length。
+    不压缩时大小与文件内容无关，不需要读取文件
+
+    参数:
+        entries: ZipEntry 列表
+    返回:
+        字节数
+    """
+    directory_offset = _layout(entries)
+    directory_size = sum(len(_central_header(entry)) for entry in entries)
+    return directory_offset + directory_size + len(_end_records(len(entries), directory_offset, directory_size))
+
+
+def generate_zip(entries):
+    """
+    边读文件边生成不压缩的 ZIP，CRC 在读取时计算，写在每个文件后的数据描述符中
+
+    参数:
+        entries: ZipEntry 列表，生成过程中文件大小不能改变
+    返回:
+        生成器，逐块返回 ZIP 数据
+    异常:
+        IOError: 文件大小与预先计算的不一致
+    """
+    directory_offset = _layout(entries)
+    for entry in entries:
+        yield _local_header(entry)
+        crc = 0
+        remaining = entry.size
+        with open(entry.path, 'rb') as f:
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        if remaining:
+            # 已经发送了 Content-Length，无法再修正，只能中断
+            raise IOError(f"文件大小已改变: {entry.path}")
+        entry.crc = crc
+        yield _data_descriptor(entry)
+
+    directory_size = 0
+    for entry in entries:
+        header = _central_header(entry)
+        directory_size += len(header)
+        yield header
+    yield _end_records(len(entries), directory_offset, directory_size)